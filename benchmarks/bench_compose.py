@@ -0,0 +1,55 @@
+"""
+Time composition of operations and the generation of a clone.
+
+The reference implementation below is the element-by-element loop that
+Operation.compose used before compositions were computed on value
+tables.
+
+Run with
+
+python benchmarks/bench_compose.py
+"""
+import time
+import timeit
+import itertools as it
+
+from wpolyanna import ExplicitOperation, BinaryOperation, Projection, Clone
+
+def loop_compose(f,F):
+    """ Compose by evaluating f on every input tuple. """
+    h = dict()
+    for x in it.product(range(f.dom),repeat=F[0].arity):
+        h[x] = f[tuple(F[i][x] for i in range(f.arity))]
+    return ExplicitOperation(F[0].arity,f.dom,h)
+
+def op(dom,vals):
+    X = list(it.product(range(dom),repeat=2))
+    return ExplicitOperation(2,dom,dict(zip(X,vals)))
+
+def bench_compose(number=2000):
+    f = op(3,[0,1,1,1,0,1,0,0,2])
+    g = op(3,[0,1,1,0,0,0,1,0,0])
+    b = BinaryOperation(3,f.f)
+    for (name,h,F) in [("ExplicitOperation",f,[g,f]),
+                       ("BinaryOperation",b,[g,f]),
+                       ("Projection args",f,[Projection(2,3,0),
+                                             Projection(2,3,1)])]:
+        h.compose(F)
+        tl = min(timeit.repeat(lambda: loop_compose(h,F),
+                               number=number,repeat=3))
+        tv = min(timeit.repeat(lambda: h.compose(F),
+                               number=number,repeat=3))
+        print("compose %-18s loop %7.1f us  table %7.1f us"
+              % (name,1e6*tl/number,1e6*tv/number))
+
+def bench_generate():
+    for vals in [[0,1,1,1,0,1,0,0,2],[0,1,1,0,0,0,1,0,0]]:
+        f = op(3,vals)
+        t = time.time()
+        C = Clone.generate([f],2)
+        print("Clone.generate dom 3, arity 2: %d operations in %.2f s"
+              % (len(C),time.time()-t))
+
+if __name__ == '__main__':
+    bench_compose()
+    bench_generate()
@@ -0,0 +1,48 @@
+"""
+Compare the memory use and lookup time of the dictionary and table
+representations of an operation.
+
+Run with
+
+python benchmarks/bench_table.py
+"""
+import sys
+import random
+import timeit
+import itertools as it
+
+from wpolyanna import ExplicitOperation, TableOperation
+
+def dict_size(f):
+    """ Bytes used by the dictionary of an ExplicitOperation, including
+    its keys. """
+    return (sys.getsizeof(f.f)
+            + sum(sys.getsizeof(x) for x in f.f))
+
+def table_size(f):
+    """ Bytes used by the array of a TableOperation. """
+    return sys.getsizeof(f.table)
+
+def bench(arity,dom,number=20000):
+    vals = [random.randrange(dom) for _ in range(dom**arity)]
+    g = TableOperation(arity,dom,vals)
+    f = g.to_explicit()
+    inputs = list(it.product(range(dom),repeat=arity))
+    x = inputs[len(inputs)//2]
+    tf = min(timeit.repeat(lambda: f[x],number=number,repeat=3))
+    tg = min(timeit.repeat(lambda: g[x],number=number,repeat=3))
+    X = [tuple(random.randrange(dom) for _ in range(64))
+         for _ in range(arity)]
+    af = min(timeit.repeat(lambda: f.apply_to_tableau(X),number=200,repeat=3))
+    ag = min(timeit.repeat(lambda: g.apply_to_tableau(X),number=200,repeat=3))
+    print("arity %d, dom %d" % (arity,dom))
+    print("  memory (bytes):        dict %8d  table %8d"
+          % (dict_size(f),table_size(g)))
+    print("  lookup (us):           dict %8.2f  table %8.2f"
+          % (1e6*tf/number,1e6*tg/number))
+    print("  64-column tableau (us): dict %8.2f  table %8.2f"
+          % (1e6*af/200,1e6*ag/200))
+
+if __name__ == '__main__':
+    for (arity,dom) in [(2,2),(3,2),(2,3),(3,3),(4,3)]:
+        bench(arity,dom)
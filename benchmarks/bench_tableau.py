@@ -0,0 +1,97 @@
+"""
+Compare the tableau loops used to build imp_ineq and wpol_ineq with
+the block evaluation of wpolyanna.tableau.
+
+Run with
+
+python benchmarks/bench_tableau.py
+"""
+import random
+import time
+import itertools as it
+
+from wpolyanna import WeightedOperation, CostFunction, Clone
+from wpolyanna.op import ExplicitOperation
+from wpolyanna.submodular import Submodular
+
+def loop_imp_ineq(wop,r):
+    """ Reference implementation of WeightedOperation.imp_ineq. """
+    index = dict((x,i) for (i,x) in
+                 enumerate(it.product(range(wop.dom),repeat=r)))
+    A = set()
+    for X in it.combinations_with_replacement(
+        it.product(range(wop.dom),repeat=r),wop.arity):
+        row = [0 for _ in range(wop.dom**r)]
+        for f in wop.get_support():
+            row[index[f.apply_to_tableau(X)]] += wop.get_weight(f)
+        if any(row):
+            A.add(tuple(row))
+    return map(list,sorted(A))
+
+def loop_wpol_ineq(cf,arity,clone):
+    """ Reference implementation of CostFunction.wpol_ineq. """
+    D = range(cf.dom)
+    T = [[],[]]
+    for t in it.product(D,repeat=cf.arity):
+        T[cf[t] != 0].append(t)
+    pos = max(cf.cost_tuple()) > 0
+    A = set()
+    for comb in it.product([0,1],repeat=arity):
+        if sum(comb) == 0 and not pos:
+            continue
+        for X in it.product(*[T[i] for i in comb]):
+            row = [0] + [cf[f.apply_to_tableau(X)] for f in clone]
+            if any(row):
+                A.add(tuple(row))
+    return map(list,sorted(A))
+
+def random_wop(arity,dom,n):
+    """ A weighted operation supported on n random operations and the
+    projections, with total weight 0. """
+    ops = []
+    for _ in range(n):
+        vals = dict((x,random.randrange(dom)) for x in
+                    it.product(range(dom),repeat=arity))
+        ops.append(ExplicitOperation(arity,dom,vals))
+    weights = [random.randint(1,3) for _ in ops]
+    proj = Clone.all_operations(arity,dom)
+    ops += [proj[i] for i in range(arity)]
+    weights += [-sum(weights[:n])] + [0]*(arity-1)
+    return WeightedOperation(arity,dom,ops,weights)
+
+def timed(f,*args):
+    start = time.time()
+    out = f(*args)
+    return out,time.time()-start
+
+def bench_imp(r,dom):
+    wop = Submodular(2) if dom == 2 else random_wop(2,dom,2)
+    (A,tl) = timed(loop_imp_ineq,wop,r)
+    (B,tb) = timed(wop.imp_ineq,r)
+    assert A == B
+    print("imp_ineq  r=%d dom=%d rows %6d  loop %8.3fs  block %8.3fs"
+          % (r,dom,len(B),tl,tb))
+
+def bench_wpol(r,dom,arity=2,loop=True):
+    costs = dict((x,random.choice([0,0,1,2])) for x in
+                 it.product(range(dom),repeat=r))
+    cf = CostFunction(r,dom,costs)
+    clone = Clone.all_operations(arity,dom)
+    (B,tb) = timed(cf.wpol_ineq,arity,clone)
+    tl = float('nan')
+    # The loop takes several minutes over the 19683 binary operations
+    # on a domain of size 3
+    if loop:
+        (A,tl) = timed(loop_wpol_ineq,cf,arity,clone)
+        assert A == B
+    print("wpol_ineq r=%d dom=%d rows %6d  loop %8.3fs  block %8.3fs"
+          % (r,dom,len(B),tl,tb))
+
+if __name__ == '__main__':
+    random.seed(0)
+    for (r,dom) in [(3,2),(4,2),(3,3),(4,3)]:
+        bench_imp(r,dom)
+    for (r,dom) in [(3,2),(4,2)]:
+        bench_wpol(r,dom)
+    for (r,dom) in [(3,3),(4,3)]:
+        bench_wpol(r,dom,loop=False)
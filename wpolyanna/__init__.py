@@ -1,9 +1,11 @@
-from wpolyanna.op import Operation, ExplicitOperation, Projection
+from wpolyanna.op import Operation, ExplicitOperation, TableOperation, Projection
 from binop import BinaryOperation
-from clone import Clone
+from clone import Clone, TableClone, AllOperations
+from inequality import InequalityMatrix
+import cache
 import wop
 from wop import WeightedOperation
 import cost_function
-from cost_function import CostFunction
+from cost_function import CostFunction, SparseCostFunction
 from cost_function import wpol
 from sharpternop import *
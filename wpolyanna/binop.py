@@ -1,7 +1,10 @@
 from itertools import combinations, permutations, product
 
+import numpy
+
 from wpolyanna.op import ExplicitOperation, Operation
 from wpolyanna.exception import DomainError
+from wpolyanna.cache import cached
 
 class BinaryOperation(ExplicitOperation):
     """ A class representing binary operations.
@@ -32,32 +35,30 @@ class BinaryOperation(ExplicitOperation):
             b = tmp
         return self.f[(a,b)]
 
+    @cached
     def compose(self,F):        
         Operation.check_compose(self,F)
         (f,g) = tuple(F)        
         if self.idem and f==g:
             return f
-        h = dict()
-        for x in product(range(self.dom),repeat=f.arity):            
-            h[x] = self[(f[x],g[x])]
+        table = self.compose_table(F)
+        h = dict(zip(product(range(self.dom),repeat=f.arity),table.tolist()))
         if f.arity == 2:
-            commutes = True
-            for (a,b) in combinations(range(self.dom),2):
-                if h[(a,b)] != h[(b,a)]:
-                    commutes = False
+            square = table.reshape(self.dom,self.dom)
+            commutes = numpy.array_equal(square,square.T)
             if commutes:
                 for (a,b) in combinations(range(self.dom),2):
                     del h[(b,a)]
-            idempotent = True
-            for a in range(self.dom):
-                if h[(a,a)] != a:
-                    idempotent = False
+            idempotent = numpy.array_equal(square.diagonal(),
+                                           numpy.arange(self.dom))
             if idempotent:
                 for a in range(self.dom):
                     del h[(a,a)]
-            return BinaryOperation(self.dom,h,commutes,idempotent)
+            h = BinaryOperation(self.dom,h,commutes,idempotent)
         else:
-            return ExplicitOperation(f,arity,self.dom,h)
+            h = ExplicitOperation(f.arity,self.dom,h)
+        h.table = table
+        return h
 
     def restrict(self,A):
         f = dict()
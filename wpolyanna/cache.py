@@ -0,0 +1,180 @@
+import collections
+import sys
+
+import numpy
+
+class CompositionCache:
+    """ A bounded cache of compositions of operations, shared by every
+    call to a compose method in this process.
+
+    An entry is found from the class, arity, domain size and value
+    table of the outer operation and of each inner operation. So the
+    cache keeps no reference to the operands, and the classes are part
+    of the key since they decide the class of the composition.
+
+    The size of an entry is the memory used by the composition (see
+    :func:`footprint`), which includes the dictionary of an operation
+    defined by a table of tuples, plus the size of the value tables in
+    its key. When the total size goes over the bound, the least
+    recently used entries are evicted.
+
+    :param maxbytes: The bound on the total size of the entries.
+    :type maxbytes: integer, Optional
+
+    .. note:: Compositions are shared between callers, so they must not
+        be modified, as for value tables.
+    """
+
+    def __init__(self,maxbytes=1 << 26):
+        self.maxbytes = maxbytes
+        self.entries = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self,f,F):
+        """ Return the key of the composition of f with the list F. """
+        return tuple((g.__class__,g.arity,g.dom,g.value_table().tostring())
+                     for g in [f] + list(F))
+
+    def get(self,key):
+        """ Return the composition stored under a key, or None.
+
+        :param key: a key from :meth:`key`
+        :returns: the composition, which becomes the most recently used
+        :rtype: :class:`Operation`
+        """
+        try:
+            (h,size) = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries[key] = (h,size)
+        self.hits += 1
+        return h
+
+    def put(self,key,h):
+        """ Store a composition, evicting the least recently used
+        compositions if the cache is too large.
+
+        :param key: a key from :meth:`key`
+        :param h: the composition
+        :type h: :class:`Operation`
+        """
+        h.value_table()
+        size = footprint(h) + sum(len(k[3]) for k in key)
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+        self.entries[key] = (h,size)
+        self.nbytes += size
+        while self.nbytes > self.maxbytes and self.entries:
+            self.nbytes -= self.entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def clear(self):
+        """ Remove every entry and reset the statistics. """
+        self.entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """ Return the statistics of this cache.
+
+        :returns: the numbers of hits, misses and evictions, and the
+            number and total size of the entries
+        :rtype: :py:class:`dict`
+        """
+        return dict(hits=self.hits,misses=self.misses,
+                    evictions=self.evictions,entries=len(self.entries),
+                    nbytes=self.nbytes)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return "CompositionCache(%d)" % self.maxbytes
+
+def footprint(h):
+    """ Return the number of bytes used by an operation and its
+    attributes.
+
+    Arrays count their data, and dictionaries, lists and tuples count
+    their entries, so the table of tuples of an
+    :class:`ExplicitOperation` is included.
+
+    :param h: the operation
+    :type h: :class:`Operation`
+    :rtype: integer
+    """
+    def size(v):
+        if isinstance(v,numpy.ndarray):
+            return sys.getsizeof(v) + v.nbytes
+        n = sys.getsizeof(v)
+        if isinstance(v,dict):
+            for (k,x) in v.iteritems():
+                n += size(k) + size(x)
+        elif isinstance(v,(tuple,list)):
+            for x in v:
+                n += size(x)
+        return n
+    return (sys.getsizeof(h) + sys.getsizeof(h.__dict__)
+            + sum(size(v) for v in h.__dict__.itervalues()))
+
+# The cache used by the compose methods, or None if caching is off
+active = None
+
+def enable(maxbytes=1 << 26):
+    """ Turn on the composition cache for this process.
+
+    :param maxbytes: The bound on the total size of the value tables in
+        the cache, including those of the operands.
+    :type maxbytes: integer, Optional
+    :returns: the cache, which is kept if caching was already on (with
+        the new bound)
+    :rtype: :class:`CompositionCache`
+    """
+    global active
+    if active is None:
+        active = CompositionCache(maxbytes)
+    else:
+        active.maxbytes = maxbytes
+    return active
+
+def disable():
+    """ Turn off the composition cache and drop its entries. """
+    global active
+    active = None
+
+def stats():
+    """ Return the statistics of the composition cache, or None if
+    caching is off (see :meth:`CompositionCache.stats`).
+    """
+    if active is None:
+        return None
+    return active.stats()
+
+def cached(compose):
+    """ Decorate a compose method so that it uses the composition cache
+    when caching is on.
+
+    :param compose: a method taking an operation and a list of
+        operations
+    :returns: the decorated method, with the original method as its
+        uncached attribute, for overrides which fall back on it
+    """
+    def cached_compose(f,F):
+        if active is None:
+            return compose(f,F)
+        key = active.key(f,F)
+        h = active.get(key)
+        if h is None:
+            h = compose(f,F)
+            active.put(key,h)
+        return h
+    cached_compose.__name__ = compose.__name__
+    cached_compose.__doc__ = compose.__doc__
+    cached_compose.uncached = compose
+    return cached_compose
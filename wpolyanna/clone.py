@@ -1,6 +1,11 @@
 import itertools as it
 
-from wpolyanna.op import Operation, ExplicitOperation, Projection
+import numpy
+
+from wpolyanna.op import Operation, ExplicitOperation, TableOperation, Projection
+from wpolyanna.op import compose_tables
+from wpolyanna.util import table_dtype, index_tuples, tuple_array, tuple_index
+from wpolyanna.util import radix
 
 class Clone:
     """ A class to represent a clone of operations.
@@ -33,6 +38,10 @@ class Clone:
         for f in self.ops:
             self.index[f] = i
             i += 1
+        self.matrix = None
+        self.rows = None
+        self.comp = dict()
+        self.perm = None
 
     def __repr__(self):
         return "Clone(%s)" % str(self.ops)
@@ -45,6 +54,11 @@ class Clone:
         """ Return the number of operations in this clone. """
         return len(self.ops)
 
+    def __contains__(self,f):
+        """ Test if an operation is in this clone. """
+        return (f.arity == self.arity and f.dom == self.dom
+                and f.value_table().tostring() in self.row_index())
+
     def __eq__(self,other):
         """ Test if this clone is equal to another. """
 
@@ -53,19 +67,223 @@ class Clone:
             or len(self) != len(other)):
             return False
 
-        S = self.ops
-        T = other.ops
-        for f in S:
-            try:
-                T.remove(f)
-            except ValueError:
-                return False
-        return True
+        S = sorted(f.tostring() for f in self.value_matrix())
+        T = sorted(f.tostring() for f in other.value_matrix())
+        return S == T
+
+    def __ne__(self,other):
+        """ Test if this clone is not equal to another. """
+        return not self == other
 
     def get_index(self,f):
         """ Return the index of a particular Operation in this clone. """
         return self.index[f]
 
+    def value_matrix(self):
+        """ Return the value tables of the operations in this clone.
+
+        :returns: a matrix whose i-th row is the value table of the i-th
+            operation. This is computed on the first call and stored.
+        :rtype: :class:`numpy.ndarray`
+        """
+        if self.matrix is None:
+            self.matrix = numpy.zeros((len(self),self.dom**self.arity),
+                                      dtype=table_dtype(self.dom))
+            for i in range(len(self)):
+                self.matrix[i] = self[i].value_table()
+        return self.matrix
+
+    def value_rows(self,lo,hi):
+        """ Return the value tables of the operations lo,...,hi-1.
+
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: Methods which only need a block of the value matrix
+            at a time should use this, so they also work with clones
+            that are never materialized.
+        """
+        return self.value_matrix()[lo:hi]
+
+    def row_index(self):
+        """ Return the hashed index of the rows of the value matrix.
+
+        :returns: a dictionary mapping the bytes of each value table to
+            the index of the corresponding operation.
+        :rtype: :py:class:`dict`
+        """
+        if self.rows is None:
+            self.rows = dict()
+            M = self.value_matrix()
+            for i in range(len(M)-1,-1,-1):
+                self.rows[M[i].tostring()] = i
+        return self.rows
+
+    def table_indices(self,G):
+        """ Return the indices of the operations with given value tables.
+
+        :param G: an array of value tables, with shape (...,dom**arity)
+        :returns: an integer array with shape G.shape[:-1], containing
+            the index of each table in this clone, or -1 for tables of
+            operations not in the clone.
+        :rtype: :class:`numpy.ndarray`
+        """
+        G = numpy.ascontiguousarray(G,dtype=table_dtype(self.dom))
+        rows = self.row_index()
+        flat = G.reshape(-1,G.shape[-1])
+        I = numpy.array([rows.get(g.tostring(),-1) for g in flat],
+                        dtype=numpy.intp)
+        return I.reshape(G.shape[:-1])
+
+    def composition_table(self,f):
+        """ Return the multiplication table of an operation over this
+        clone.
+
+        :param f: an operation of arity m, usually a member of this clone
+        :type f: :class:`Operation`
+        :returns: an integer array R of shape (N,)*m, where N is the size
+            of the clone, such that R[t] is the index of the composition
+            of f with the operations indexed by t, or -1 if this
+            composition is not in the clone.
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: The table is stored, so later calls and calls to
+            :meth:`compose_index` with the same operation are integer
+            lookups. It has N**m entries, so it should only be requested
+            for small clones.
+        """
+        try:
+            return self.comp[f]
+        except KeyError:
+            N = len(self)
+            M = self.value_matrix()
+            R = numpy.empty(N**f.arity,dtype=numpy.intp)
+            start = 0
+            for T in index_tuples([(0,N)]*f.arity):
+                G = compose_tables(f.value_table(),M[T],self.dom)
+                R[start:start+len(T)] = self.table_indices(G)
+                start += len(T)
+            R = R.reshape((N,)*f.arity)
+            self.comp[f] = R
+            return R
+
+    def compose_indices(self,f,T):
+        """ Return the indices of the compositions of f with a block of
+        tuples of elements of this clone.
+
+        :param f: an operation of arity m
+        :param T: an integer array of shape (B,m), whose rows are the
+            indices of m operations in this clone
+        :returns: an integer array whose b-th entry is the index of
+            f(self[T[b,0]],...,self[T[b,m-1]]), or -1 if this composition
+            is not in the clone
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: If the composition table of f has been computed, this
+            is a lookup. Otherwise, the compositions are computed from
+            the value tables.
+        """
+        T = numpy.asarray(T)
+        if f in self.comp:
+            return self.comp[f][tuple(T.T)]
+        return self.table_indices(compose_tables(f.value_table(),
+                                                 self.value_matrix()[T],
+                                                 self.dom))
+
+    def compose_index(self,f,t):
+        """ Return the index of the composition of f with some elements
+        of this clone.
+
+        :param f: an operation of arity m
+        :param t: the indices of m operations in this clone
+        :returns: the index of f(self[t[0]],...,self[t[m-1]])
+        :raises: KeyError, if the composition is not in the clone
+
+        .. note:: If the composition table of f has been computed, this
+            is a lookup. Otherwise, the composition is computed from the
+            value tables.
+        """
+        if f in self.comp:
+            i = self.comp[f][tuple(t)]
+        else:
+            M = self.value_matrix()
+            i = self.table_indices(compose_tables(f.value_table(),M[list(t)],
+                                                  self.dom))
+        if i < 0:
+            raise KeyError(t)
+        return int(i)
+
+    def permutation_table(self):
+        """ Return the action on this clone of permuting the arguments of
+        its operations.
+
+        :returns: a pair (S,P), where S is the list of permutations of
+            range(arity) and P is an integer array such that P[k][i] is
+            the index of the operation
+            (x_0,...,x_{arity-1}) -> self[i](x_S[k][0],...,x_S[k][arity-1]),
+            or None if the clone is not closed under permuting
+            arguments.
+        :rtype: (:py:func:`list` of :py:func:`tuple`,
+            :class:`numpy.ndarray`)
+
+        .. note:: The result is computed from the value tables a block at
+            a time on the first call and stored.
+        """
+        if self.perm is None:
+            X = tuple_array(self.arity,self.dom)
+            place = radix(self.arity,self.dom)
+            S = list(it.permutations(range(self.arity)))
+            P = numpy.empty((len(S),len(self)),dtype=numpy.intp)
+            block = max(1,(1 << 20) // self.dom**self.arity)
+            for k in range(len(S)):
+                c = X[:,list(S[k])].astype(numpy.int64).dot(place)
+                for lo in range(0,len(self),block):
+                    V = self.value_rows(lo,lo+block)
+                    P[k,lo:lo+len(V)] = self.table_indices(V[:,c])
+            if (P < 0).any():
+                self.perm = (S,None)
+            else:
+                self.perm = (S,P)
+        if self.perm[1] is None:
+            return None
+        return self.perm
+
+    def orbits(self):
+        """ Return the orbits of this clone under permuting arguments.
+
+        :returns: a pair (reps,orbit), where reps is the increasing list
+            of the smallest index in each orbit, and orbit[i] is the
+            position in reps of the orbit of the i-th operation.
+        :rtype: (:py:func:`list` of integer, :class:`numpy.ndarray`)
+
+        .. note:: If the clone is not closed under permuting arguments
+            (see :meth:`permutation_table`), every operation is its own
+            orbit.
+        """
+        perm = self.permutation_table()
+        if perm is None:
+            return range(len(self)),numpy.arange(len(self))
+        least = perm[1].min(axis=0)
+        (reps,orbit) = numpy.unique(least,return_inverse=True)
+        return reps.tolist(),orbit
+
+    def orbit_sums(self,M):
+        """ Sum the columns of a matrix over each orbit of this clone.
+
+        :param M: a matrix with a column for each operation in this
+            clone
+        :returns: a matrix with a column for each orbit (see
+            :meth:`orbits`), holding the sum of the columns of M indexed
+            by the operations in the orbit
+        :rtype: :class:`numpy.ndarray`
+        """
+        (reps,orbit) = self.orbits()
+        M = numpy.asarray(M)
+        order = numpy.argsort(orbit,kind='mergesort')
+        start = numpy.searchsorted(orbit[order],numpy.arange(len(reps)))
+        if len(M) == 0:
+            return numpy.zeros((0,len(reps)),dtype=M.dtype)
+        return numpy.add.reduceat(M[:,order],start,axis=1)
+
     @staticmethod
     def all_operations(arity,dom):
         """ Return the clone of all operations.
@@ -74,52 +292,116 @@ class Clone:
         :type arity: int
         :param dom: the domain size
         :type dom: int       
+        :rtype: :class:`AllOperations`
+
+        .. note:: The operations are not created; see
+            :class:`AllOperations`.
         """
-        
-        D = range(dom)
-        tuples = []
-        for x in it.product(D,repeat=arity):
-            tuples.append(x)
-        ops = [Projection(arity,dom,i) for i in range(arity)]
-        for vals in it.product(D,repeat=len(tuples)):
-            fmap = dict()
-            for i in range(len(tuples)):
-                fmap[tuples[i]] = vals[i]
-            f = ExplicitOperation(arity,dom,fmap)
-            if not f.is_projection():
-                ops.append(f)
-        return Clone(ops)
+        return AllOperations(arity,dom)
+
+    @staticmethod
+    def closure(C,expand,log=False):
+        """ Extend a list of operations with the compositions found by
+        a rule, in the order the rule finds them.
+
+        Membership is tested on a hash set of value tables, so the
+        operations in the list should be distinct.
+
+        :param C: the initial operations, which are all of the same arity
+            and domain. This list is extended in place.
+        :type C: list of :class:`Operation`
+        :param expand: a function taking a function which returns the
+            matrix of value tables of C. It must return an iterator over
+            pairs (G,make), where G is an array of value tables and
+            make(i) returns the operation whose value table is G[i]. The
+            new rows of G are added to C, in order, before the iterator
+            is resumed, so the rule can go on to compose them. The
+            closure is semi-naive if the rule only composes tuples
+            involving an operation it has not composed before.
+        :param log: Flag to request each new operation is printed.
+        :type log: boolean, optional
+        :returns: C
+        """
+        dom = C[0].dom
+        M = numpy.zeros((max(len(C),1),dom**C[0].arity),
+                        dtype=table_dtype(dom))
+        seen = set()
+        for i in range(len(C)):
+            M[i] = C[i].value_table()
+            seen.add(M[i].tostring())
+        tables = lambda: M[:len(C)]
+        for (G,make) in expand(tables):
+            for i in range(len(G)):
+                key = G[i].tostring()
+                if not key in seen:
+                    seen.add(key)
+                    g = make(i)
+                    if log:
+                        print (len(C),g)
+                    if len(C) == len(M):
+                        M = numpy.resize(M,(2*len(M),M.shape[1]))
+                    M[len(C)] = G[i]
+                    C.append(g)
+        return C
 
     @staticmethod
     def generate(F,arity,log=False):
         """ Compute the arity arity clone generated by F.
 
+        This is the subuniverse of A^(d^k) generated by the
+        projections under the operations in F, where each operation
+        is applied to distinct arguments.
+
+        Each operation f in F is applied in turn, until none of them
+        gives a new operation. Only the tuples involving an operation
+        found since f was last applied are composed, and the new
+        operations are added in the lexicographic order of the first
+        tuple giving them, so the clone is in the order of
+        :func:`itertools.permutations`.
+
         :param F: the set of operations
         :type F: list of Operation
         :param arity: the arity
         :type arity: int
         """
-        count = arity
         dom = F[0].dom
-        
         C = [Projection(arity,dom,i) for i in range(arity)]
-        
-        # Close under compositions
-        # Repeat until no new operations added
-        changed = True
-        while changed:
-            changed = False
-            for f in F:
-                for t in it.permutations(C,f.arity):
-                    g = f.compose(t)
-                    if not g in C:
-                        if log:                            
-                            count += 1
-                            print (count,g)
-                        C.append(g)
-                        changed = True
+
+        def expand(tables):
+            # The number of operations each f was last applied to
+            done = [0 for _ in F]
+            while min(done) < len(C):
+                for (k,f) in enumerate(F):
+                    (lo,hi) = (done[k],len(C))
+                    done[k] = hi
+                    M = tables()
+                    # The smallest tuple giving each composition
+                    first = dict()
+                    # Tuples of distinct elements of C whose first new
+                    # element is at position p
+                    for p in range(f.arity):
+                        ranges = ([(0,lo)]*p + [(lo,hi)]
+                                  + [(0,hi)]*(f.arity-p-1))
+                        for T in index_tuples(ranges,distinct=True):
+                            T = T[numpy.lexsort(T.T[::-1])]
+                            G = compose_tables(f.value_table(),M[T],dom)
+                            V = numpy.ascontiguousarray(G).view(
+                                numpy.dtype((numpy.void,G[0].nbytes)))
+                            for i in numpy.unique(V.ravel(),
+                                                  return_index=True)[1]:
+                                key = G[i].tostring()
+                                t = tuple(T[i].tolist())
+                                if not key in first or t < first[key][0]:
+                                    first[key] = (t,G[i])
+                    if len(first) > 0:
+                        new = sorted(first.values(),key=lambda v: v[0])
+                        yield (numpy.array([g for (t,g) in new]),
+                               lambda i,f=f,new=new:
+                               f.compose([C[j] for j in new[i][0]]))
+
+        Clone.closure(C,expand,log)
         if log:
-            print count
+            print len(C)
         return Clone(C)
     
     @staticmethod
@@ -127,45 +409,219 @@ class Clone:
         """
         Generate the operations of some arity arity in the clone generated
         by F.
+
+        We start from the projections and the restrictions of the
+        elements of F to the required arity. Then each operation f, in
+        the order they are found, is composed with each operation g
+        found so far, substituting g into one input of f with
+        projections as the remaining inputs.
         """
         dom = F[0].dom
-        if log:
-            count = 0;
         
         # Always want to have all projections
         C = [Projection(arity,dom,i) for i in range(arity)]
+        P = numpy.array([p.value_table() for p in C])
 
         # Add all restrictions of elements of F to the required arity
+        seen = set(p.value_table().tostring() for p in C)
         for f in F:
             for t in it.product(C[0:arity],repeat=f.arity):
                 g = f.compose(t)
-                if not g in C:
-                    if log:                    
-                        print (count,g)
-                        count += 1
+                key = g.value_table().tostring()
+                if not key in seen:
+                    if log:
+                        print (len(C),g)
+                    seen.add(key)
                     C.append(g)
 
-        # Generate elements by iteration
-        # For each f,g in C we compute the operation h in which
-        # g is substituted for the i-th input of f, adding if it
-        # is not in the clone.
-        # This procedure is repeated until we have checked every element
-        i = 0
-        while i < len(C):
-            f = C[i]    
-            for g in C:
-                # Add every operation obtained by composing f with
-                # g and a number of projections 
-                for t in it.product(C[0:arity],repeat=f.arity-1):
-                    t = list(t)
-                    for j in range(arity):
-                        t.insert(j,g)
-                        h = f.compose(t)
-                        if not h in C:
-                            C.append(h)
-                            if log:
-                                print (count,h)
-                                count += 1                        
-                        del t[j]
-            i += 1
+        # For each f,g in C we compute the operation h in which g is
+        # substituted for the j-th input of f, and the remaining inputs
+        # are projections.
+        # Every list of inputs is given by the position j of g and
+        # the indices t of the projections.
+        J = []
+        for t in it.product(range(arity),repeat=arity-1):
+            for j in range(arity):
+                J.append((j,t))
+        block = max(1,(1 << 16) // (len(J)*P.shape[1]))
+        def substitute(tables):
+            i = 0
+            while i < len(C):
+                # The operations g found while f is composed are
+                # composed with f too
+                lo = 0
+                while lo < len(C):
+                    M = tables()
+                    g = numpy.arange(lo,min(lo+block,len(C)))
+                    X = numpy.empty((len(g),len(J),arity,M.shape[1]),
+                                    dtype=M.dtype)
+                    for (k,(j,t)) in enumerate(J):
+                        X[:,k,:j] = P[list(t[:j])]
+                        X[:,k,j] = M[g]
+                        X[:,k,j+1:] = P[list(t[j:])]
+                    G = compose_tables(M[i],X,dom).reshape(-1,M.shape[1])
+                    def make(n,f=C[i],g=g):
+                        (j,t) = J[n % len(J)]
+                        args = [C[a] for a in t]
+                        args.insert(j,C[g[n // len(J)]])
+                        return f.compose(args)
+                    yield (G,make)
+                    lo += len(g)
+                i += 1
+        Clone.closure(C,substitute,log)
         return Clone(C)
+
+
+class TableClone(Clone):
+    """ A clone stored as a single matrix of value tables.
+
+    Operations are only created, as :class:`TableOperation` objects,
+    when they are requested, and indices are found from the hashed row
+    index of the matrix.
+
+    :param matrix: The value tables of the operations, one per row.
+    :type matrix: array with dom**arity columns
+    :param arity: The arity of the clone.
+    :type arity: integer
+    :param dom: The domain size.
+    :type dom: integer
+    """
+
+    def __init__(self,matrix,arity,dom):
+        """
+        Create a new clone object from a matrix of value tables.
+        """
+        self.arity = arity
+        self.dom = dom
+        self.matrix = numpy.asarray(matrix,dtype=table_dtype(dom))
+        self.rows = None
+        self.comp = dict()
+        self.perm = None
+
+    @staticmethod
+    def from_clone(clone):
+        """ Return a TableClone containing the operations of a clone,
+        in the same order. """
+        return TableClone(clone.value_matrix(),clone.arity,clone.dom)
+
+    def __repr__(self):
+        return "TableClone(%s, %d, %d)" % (self.matrix.tolist(),
+                                           self.arity,self.dom)
+
+    def __getitem__(self,i):
+        """ Return the i-th operation in this clone. """
+        return TableOperation(self.arity,self.dom,self.matrix[i])
+
+    def __len__(self):
+        """ Return the number of operations in this clone. """
+        return len(self.matrix)
+
+    def get_index(self,f):
+        """ Return the index of a particular Operation in this clone. """
+        if f.arity != self.arity or f.dom != self.dom:
+            raise KeyError(f)
+        return self.row_index()[f.value_table().tostring()]
+
+
+class AllOperations(Clone):
+    """ The clone of all operations of a given arity, which is never
+    materialized.
+
+    The projections come first, and are followed by the other
+    operations in lexicographic order of their value tables. An
+    operation is decoded from the mixed-radix encoding of its value
+    table when it is requested, and its index is computed from this
+    encoding, so the memory used does not depend on the size of the
+    clone.
+
+    :param arity: The arity of the clone.
+    :type arity: integer
+    :param dom: The domain size.
+    :type dom: integer
+
+    .. note:: The clone contains dom**(dom**arity) operations, and this
+        must be smaller than 2**63.
+    """
+
+    def __init__(self,arity,dom):
+        """
+        Create the clone of all operations.
+        """
+        self.arity = arity
+        self.dom = dom
+        self.size = dom**(dom**arity)
+        self.place = radix(dom**arity,dom)
+        # The encodings of the projections, in increasing order
+        X = tuple_array(arity,dom)
+        self.proj = [tuple_index(X[:,i].tolist(),dom) for i in range(arity)]
+        self.skip = sorted(self.proj)
+        self.matrix = None
+        self.rows = None
+        self.comp = dict()
+        self.perm = None
+
+    def __repr__(self):
+        return "AllOperations(%d, %d)" % (self.arity,self.dom)
+
+    def __len__(self):
+        """ Return the number of operations in this clone. """
+        return self.size
+
+    def __getitem__(self,i):
+        """ Return the i-th operation in this clone. """
+        if i < 0:
+            i += self.size
+        if i < 0 or i >= self.size:
+            raise IndexError(i)
+        if i < self.arity:
+            return Projection(self.arity,self.dom,i)
+        return TableOperation(self.arity,self.dom,self.value_rows(i,i+1)[0])
+
+    def __contains__(self,f):
+        """ Test if an operation is in this clone. """
+        return f.arity == self.arity and f.dom == self.dom
+
+    def __eq__(self,other):
+        """ Test if this clone is equal to another. """
+        if isinstance(other,AllOperations):
+            return self.arity == other.arity and self.dom == other.dom
+        return Clone.__eq__(self,other)
+
+    def get_index(self,f):
+        """ Return the index of a particular Operation in this clone. """
+        if not f in self:
+            raise KeyError(f)
+        return int(self.table_indices(f.value_table()))
+
+    def value_rows(self,lo,hi):
+        """ Return the value tables of the operations lo,...,hi-1,
+        decoded from their indices. """
+        i = numpy.arange(lo,min(hi,self.size),dtype=numpy.int64)
+        code = i - self.arity
+        for c in self.skip:
+            code += code >= c
+        for j in range(lo,min(hi,self.arity)):
+            code[j-lo] = self.proj[j]
+        return ((code[:,None] // self.place) % self.dom).astype(
+            table_dtype(self.dom))
+
+    def value_matrix(self):
+        """ Return the value tables of all operations.
+
+        .. warning:: This materializes the whole clone.
+        """
+        if self.matrix is None:
+            self.matrix = self.value_rows(0,self.size)
+        return self.matrix
+
+    def table_indices(self,G):
+        """ Return the indices of the operations with given value
+        tables, computed from their encodings. """
+        G = numpy.asarray(G)
+        code = numpy.atleast_1d(G.astype(numpy.int64).dot(self.place))
+        index = self.arity + code
+        for c in self.skip:
+            index -= code > c
+        for i in range(self.arity):
+            index[code == self.proj[i]] = i
+        return index.reshape(G.shape[:-1])
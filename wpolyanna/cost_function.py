@@ -1,11 +1,15 @@
 import itertools as it
 import cdd
 import pulp
+import numpy
 
 from wpolyanna.exception import *
 import wpolyanna.wop
 from wpolyanna.clone import Clone
-from wpolyanna.util import binary_search
+from wpolyanna import tableau
+from wpolyanna.inequality import InequalityMatrix, SeparationLP
+from wpolyanna import parallel
+from wpolyanna.util import radix
 
 class CostFunction:
     """ A class representing cost functions. 
@@ -20,7 +24,15 @@ class CostFunction:
 
     .. note:: At the moment, the program is only designed to handle
         cost functions in which every tuple is assigned a finite value.
+
+    .. note:: Subclasses computing their costs only need to define
+        __getitem__. The costs of all tuples are computed once, when
+        they are first needed (see :meth:`cost_table`).
     """
+
+    # The compiled costs and the hash value, until they are computed
+    table = None
+    hash = -1
     
     def __init__(self,arity,dom,costs):
         """ Create a new cost function. """
@@ -48,7 +60,7 @@ class CostFunction:
         """ Test for equality. """
         return (self.dom == other.dom
                 and self.arity == other.arity
-                and self.cost_tuple() == other.cost_tuple())
+                and numpy.array_equal(self.cost_table(),other.cost_table()))
             
     def __ne__(self,other):
         """ Test for disequality. """
@@ -56,7 +68,7 @@ class CostFunction:
 
     def __hash__(self):
         if self.hash < 0:
-            self.hash = int(self.arity + self.dom + sum(self.cost_tuple()))
+            self.hash = int(self.arity + self.dom + self.cost_table().sum())
         return self.hash
     
     def __repr__(self):
@@ -65,18 +77,52 @@ class CostFunction:
     def __str__(self):
         """Return a string representation of this cost function. """
         s = "%d %d\n" % (self.arity,self.dom)
-        pairs = [(x,self[x]) for x in it.product(range(self.dom),repeat=self.arity)] 
+        pairs = zip(it.product(range(self.dom),repeat=self.arity),
+                    self.cost_table().tolist())
         for (t,c) in pairs:
             s += "%s %f\n" % (str(t),c)
         return s
 
     def cost_tuple(self):
         """Return the tuple of costs, in lexicographic order. """
-        
-        costs = []
-        for t in it.product(range(self.dom),repeat=self.arity  ):
-            costs.append(self[t])
-        return tuple(costs)
+        return tuple(self.cost_table().tolist())
+
+    def cost_table(self):
+        """ Return the array of costs.
+
+        :returns: the costs of all tuples, in lexicographic order, so
+            the cost of x is at position tuple_index(x,dom) (see
+            :func:`wpolyanna.util.tuple_index`).
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: The table is computed from __getitem__ on the first
+            call and stored, so cost functions must not be modified
+            after it is used.
+        """
+        if self.table is None:
+            self.table = numpy.array([self[t] for t in it.product(
+                range(self.dom),repeat=self.arity)])
+        return self.table
+
+    def cost_support(self):
+        """ Return the positions of the tuples with non-zero cost.
+
+        :returns: the increasing positions, in the order of
+            :meth:`cost_table`, of the tuples whose cost is not 0
+        :rtype: :class:`numpy.ndarray`
+        """
+        return numpy.flatnonzero(self.cost_table())
+
+    def tuple_costs(self,I):
+        """ Return the costs of the tuples at some positions.
+
+        :param I: positions of tuples, in the order of :meth:`cost_table`
+        :type I: :class:`numpy.ndarray` of integer
+        :returns: the array of the same shape holding the cost of the
+            tuple at each position
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self.cost_table()[I]
 
     def wpol_ineq(self,arity,clone=None):
         """ Return the set of inequalities the weighted polymorphisms
@@ -100,83 +146,130 @@ class CostFunction:
         if clone is None:
             clone = Clone.all_operations(arity,self.dom)
             
-        # N is the number of operations in the clone. We will need a
-        # variable for each of these
-        N = len(clone)
-        A = []
+        # The rows are kept once each, in sorted order. Every row
+        # starts with a 0, so it can be passed to cdd as it is.
+        A = InequalityMatrix()
+        for B in self.wpol_rows(arity,clone):
+            A.extend(B)
+        A.sort()
+        return A.to_list()
+
+    def wpol_rows(self,arity,clone,block=1 << 12):
+        """ Generate the inequalities imposed by the tableaux on the
+        weighted polymorphisms, a block at a time.
+
+        :param arity: The arity of the weighted polymorphisms.
+        :type arity: integer
+        :param clone: The supporting clone.
+        :type clone: :class:`Clone`
+        :param block: The number of tableaux in each block.
+        :type block: integer, Optional
+        :returns: An iterator over arrays, whose rows are the
+            inequalities given by each block of tableaux, with a leading
+            0.
+        :rtype: iterator of :class:`numpy.ndarray`
+
+        .. note:: The clone is read a block of value tables at a time
+            (see :func:`wpolyanna.tableau.cost_rows`), so it is never
+            materialized.
+
+        .. note:: Permuting the rows of a tableau permutes the arguments
+            of the operations applied to it. If the clone is closed
+            under permuting arguments (see
+            :meth:`Clone.permutation_table`), only one tableau with
+            sorted rows is evaluated per orbit, and the rows of the
+            others are obtained by permuting the columns of its row.
+        """
+        costs = self.tuple_costs
+        n = self.dom**self.arity
+        support = self.cost_support()
+        pos = (costs(support) > 0).any()
+        zero = lambda B: numpy.zeros((len(B),1),dtype=B.dtype)
 
         # Divide the tuples into sets of zero and non-zero cost 
-        r = self.arity
-        D = range(self.dom)
-        T = [[],[]]
-        neg,pos = False,False
-        for t in it.product(D,repeat=r):
-            if self[t] == 0:
-                T[0].append(t)
-            else:
-                T[1].append(t)
-                if self[t] > 0:
-                    pos = True
-                elif self[t] < 0:
-                    neg = True
-        
-        # Tableaus containing at least one non-zero tuple
-        for comb in it.product([0,1],repeat=arity):
-            if sum(comb) > 0:
-                for X in it.product(*[T[i] for i in comb]):
-                    row = [0 for _ in range(N+1)]   
-                    for i in xrange(0,N):
-                        row[i+1] = self[clone[i].apply_to_tableau(X)]
-                    # Insert row if not already in A
-                    # We keep A sorted to make this check more efficient
-                    if len(A) == 0:
-                        A = [row]
-                    else:
-                        i = binary_search(A,row)
-                        if i == len(A) or A[i] != row:
-                            A.insert(i,row)
-
-        # We only need tableaus with all zero tuples if there are some
+        zero_cost = numpy.ones(n,dtype=bool)
+        zero_cost[support] = False
+        T = [numpy.flatnonzero(zero_cost),support]
+
+        perm = clone.permutation_table() if arity > 1 else None
+        if perm is not None:
+            # Sorted tableaus with k zero tuples, containing at least
+            # one non-zero tuple. We only need tableaus with all zero
+            # tuples if there are some positive weighted tuples
+            (S,P) = perm
+            for k in range(arity+1):
+                if k == arity and not pos:
+                    continue
+                for X in tableau.split_combinations(T[0],T[1],k,arity,block):
+                    B = tableau.cost_rows(clone,costs,X,self.arity,self.dom)
+                    if k == arity:
+                        keep = (B != 0).any(axis=1)
+                        (X,B) = (X[keep],B[keep])
+                    for q in range(len(S)):
+                        # A permutation which swaps two equal rows gives
+                        # a tableau we have already seen
+                        new = numpy.ones(len(X),dtype=bool)
+                        for (i,j) in it.combinations(range(arity),2):
+                            if S[q][i] > S[q][j]:
+                                new &= X[:,S[q][i]] != X[:,S[q][j]]
+                        yield numpy.hstack([zero(B[new]),B[new][:,P[q]]])
+            return
+
+        # Tableaus containing at least one non-zero tuple. We only
+        # need tableaus with all zero tuples if there are some
         # positive weighted tuples
-        if pos:
-            for X in it.product(T[0],repeat=arity):
-                row = [0 for _ in range(N+1)]
-                trivial = True
-                for i in xrange(0,N):
-                    row[i+1] = self[clone[i].apply_to_tableau(X)]
-                    if row[i+1] != 0:
-                        trivial = False
-                if not trivial:
-                    if len(A) == 0:
-                        A = [row]
-                    else:
-                        i = binary_search(A,row)
-                        if i == len(A) or A[i] != row:
-                            A.insert(i,row)
-        return A
+        for comb in it.product([0,1],repeat=arity):
+            if sum(comb) == 0 and not pos:
+                continue
+            for X in tableau.products([T[i] for i in comb],block):
+                B = tableau.cost_rows(clone,costs,X,self.arity,self.dom)
+                if sum(comb) == 0:
+                    B = B[(B != 0).any(axis=1)]
+                yield numpy.hstack([zero(B),B])
 
     def wop_ineq(self,arity,clone=None):
         """ Returns the set of inequalities defining a weighted operation.
         """
+        A = []
+        for B in self.wop_rows(arity,clone):
+            A.extend(B.tolist())
+        return A
+
+    def wop_rows(self,arity,clone=None,block=1 << 20):
+        """ Generate the inequalities defining a weighted operation, a
+        block at a time.
+
+        :param arity: The arity of the weighted operations.
+        :type arity: integer
+        :param clone: The supporting clone.
+        :type clone: :class:`Clone`, Optional
+        :param block: The number of entries in each block. Each block
+            holds at least one row.
+        :type block: integer, Optional
+        :returns: An iterator over arrays holding the rows of
+            :meth:`wop_ineq`, in the same order.
+        :rtype: iterator of :class:`numpy.ndarray`
+        """
         if clone is None:
             # |D|^(|D|^r) r-ary operations on D
             N = self.dom**(self.dom**arity)
         else:
             N = len(clone)
-        A = []
         # All non-projections are non-negative
-        for i in xrange(arity,N):
-            row = [0 for _ in range(N+1)]
-            row[i+1] = -1
-            A.append(row)
+        step = max(1,block // (N+1))
+        for lo in xrange(arity,N,step):
+            hi = min(N,lo+step)
+            B = numpy.zeros((hi-lo,N+1),dtype=int)
+            B[numpy.arange(hi-lo),numpy.arange(lo,hi)+1] = -1
+            yield B
 
         # All weights sum to 0
-        A.append([0] + [1 for _ in range(N)])
-        A.append([0] + [-1 for _ in range(N)])
-
-        return A
+        B = numpy.zeros((2,N+1),dtype=int)
+        B[0,1:] = 1
+        B[1,1:] = -1
+        yield B
     
-    def wpol(self,arity,clone=None,multimorphisms=False):
+    def wpol(self,arity,clone=None,multimorphisms=False,symmetric=False):
         """ Return the weighted polymorphisms.
 
         This method obtains the matrix of inequalities defining the
@@ -190,6 +283,10 @@ class CostFunction:
         :param multimorphisms: Flag to request we only generate
             multimorphisms.
         :type multimorphisms: boolean, optional
+        :param symmetric: Flag to request only symmetric weighted
+            polymorphisms, computed with one variable per orbit (see
+            :func:`orbit_ineq`).
+        :type symmetric: boolean, optional
 
         .. note:: We implicitly assume that any clone passed in to the
             function is a subset of the set of feasibility polymorphisms.
@@ -201,81 +298,224 @@ class CostFunction:
         """
         if clone is None:
             clone = Clone.all_operations(arity,self.dom)
-        N = len(clone)
-        A = self.wop_ineq(arity,clone)
+        A = InequalityMatrix()
+        for B in self.wop_rows(arity,clone):
+            A.extend(B)
         
         # Get the weighted polymorphism inequalities
-        for row in self.wpol_ineq(arity,clone):
-            if not row in A:
-                A.append(row)
+        A.extend(self.wpol_ineq(arity,clone))
+
+        if symmetric:
+            (reps,A) = orbit_ineq(A,clone)
+        else:
+            reps = range(len(clone))
 
-        poly = cdd.Polyhedron(cdd.Matrix(A))
+        poly = cdd.Polyhedron(A.to_cdd())
         ray_mat = poly.get_generators()
         W = []
         for i in range(ray_mat.row_size):
             weights = []
             ops = []
-            for j in range(N):
+            for j in range(len(reps)):
                 rval = round(ray_mat[i][j+1],self.dom)
                 if rval != 0:
                     weights.append(-rval)
-                    ops.append(clone[j])
+                    ops.append(clone[reps[j]])
             W.append(wpolyanna.wop.WeightedOperation(arity,
                                                      self.dom,
                                                      ops,
                                                      weights))
         return W
 
-    def wpol_separate(self,Gamma,arity,clone=None):
+    def wpol_separate(self,Gamma,arity,clone=None,workers=None,solver=None):
         """ Test if this cost function can be expressed over a set of cost functions.
 
         :param Gamma: the other cost functions
+        :param workers: the number of processes used to try the
+            inequalities of this cost function. The first separating
+            inequality, in the order of wpol_ineq, is still the one used.
+        :type workers: integer, optional
+        :param solver: The LP solver, e.g. an in-process one. If not
+            given, the default solver of pulp is used.
+        :type solver: :class:`pulp.LpSolver`, optional
         :returns: A separating weighted polymorphism if it exists and
         false otherwise.
+
+        .. note:: The inequalities of Gamma are put into a single
+            :class:`SeparationLP`, and only the inequality to violate
+            changes between solves.
         """
         if clone is None:
             clone = Clone.all_operations(arity,self.dom)
         N = len(clone)
         
-        A = self.wop_ineq(arity,clone)
+        A = InequalityMatrix()
+        for B in self.wop_rows(arity,clone):
+            A.extend(B)
         for gamma in Gamma:
-            for a in gamma.wpol_ineq(arity,clone):
-                if not a in A:
-                    A.append(a)
+            A.extend(gamma.wpol_ineq(arity,clone))
 
         # For each wpol inequality of this cost function, check if
         # there exists a wpol of Gamma violating it
-        for c in self.wpol_ineq(arity,clone):
+        state = {'lp': SeparationLP(A,offset=1,solver=solver)}
+        y = parallel.pool_first(separate_task,self.wpol_ineq(arity,clone),
+                                workers,state)
+        if y is None:
+            # Return false if we couldn't find a separating wop
+            return False
 
-            prob = pulp.LpProblem()
-            
-            # One variable for each operation in the clone
-            y = pulp.LpVariable.dicts("y",xrange(N))
+        op = []
+        w = []
+        for i in xrange(N):
+            yval = round(y[i],self.dom)
+            if yval != 0:
+                op.append(clone[i])
+                w.append(yval)
+        return wpolyanna.wop.WeightedOperation(arity,self.dom,op,w)
+        
+class SparseCostFunction(CostFunction):
+    """ A cost function which stores the costs differing from a default
+    cost.
 
-            # Must satisfy all inequalities in A
-            for a in A:
-                prob += sum(y[i]*a[i+1] for i in xrange(N)) <= 0
+    :param arity: The arity.
+    :type arity: integer
+    :param dom: The size of the domain.
+    :type dom: integer
+    :param costs: The costs of the tuples whose cost is not the
+        default.
+    :type costs: :py:class:`dict` mapping :py:func:`tuple` of integer to
+        rational
+    :param default: The cost of every other tuple.
+    :type default: rational, Optional
+
+    .. note:: The tuples are checked and indexed once, when the cost
+        function is created. The tableaux of :meth:`wpol_ineq` look up
+        costs in the stored costs (see :meth:`tuple_costs`), so the
+        table of all costs is only built if another method needs it.
+    """
+
+    def __init__(self,arity,dom,costs,default=0):
+        """ Create a new sparse cost function. """
+        CostFunction.__init__(self,arity,dom,costs)
+        self.default = default
+        keys = costs.keys()
+        for x in keys:
+            self.check_input(x)
+        X = numpy.array(keys,dtype=numpy.int64).reshape(len(keys),arity)
+        I = X.dot(radix(arity,dom))
+        order = numpy.argsort(I)
+        # The positions of the stored tuples in increasing order, and
+        # their costs followed by the default cost
+        self.positions = I[order]
+        self.values = numpy.array([costs[x] for x in keys] + [default])[
+            numpy.append(order,len(keys))]
+
+    def __getitem__(self,x):
+        """Return the cost of a particular tuple. """
+        self.check_input(x)
+        return self.costs.get(x,self.default)
+
+    def __repr__(self):
+        return "SparseCostFunction(%d, %d, %s, %s)" % (self.arity,self.dom,
+                                                      str(self.costs),
+                                                      repr(self.default))
+
+    def __str__(self):
+        """Return a string representation of this cost function, listing
+        the stored costs. """
+        s = "%d %d\n" % (self.arity,self.dom)
+        s += "default %f\n" % self.default
+        for t in sorted(self.costs):
+            s += "%s %f\n" % (str(t),self.costs[t])
+        return s
+
+    def stored(self):
+        """ Return the positions and costs of the stored tuples.
+
+        :returns: a pair (I,c), where I holds the positions of the
+            stored tuples in increasing order, in the order of
+            :meth:`cost_table`, and c[k] is the cost of the tuple at I[k]
+        :rtype: (:class:`numpy.ndarray`, :class:`numpy.ndarray`)
+        """
+        return self.positions,self.values[:-1]
+
+    def tuple_costs(self,I):
+        """ Return the costs of the tuples at some positions, found by
+        binary search in the stored tuples. """
+        I = numpy.asarray(I)
+        n = len(self.positions)
+        k = numpy.searchsorted(self.positions,I)
+        hit = k < n
+        hit[hit] = self.positions[k[hit]] == I[hit]
+        return self.values[numpy.where(hit,k,n)]
+
+    def cost_table(self):
+        """ Return the array of costs, filled in from the stored costs.
+
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: The table is built on the first call and stored.
+        """
+        if self.table is None:
+            (I,c) = self.stored()
+            self.table = numpy.empty(self.dom**self.arity,
+                                     dtype=self.values.dtype)
+            self.table.fill(self.default)
+            self.table[I] = c
+        return self.table
+
+    def cost_support(self):
+        """ Return the positions of the tuples with non-zero cost, found
+        from the stored costs. """
+        (I,c) = self.stored()
+        if self.default == 0:
+            return I[c != 0]
+        return numpy.setdiff1d(numpy.arange(self.dom**self.arity),I[c == 0])
 
-            # Must violate c
-            prob += sum(y[i]*c[i+1] for i in range(N)) >= 1
-            
-            prob.solve()
-
-            if pulp.LpStatus[prob.status] == 'Optimal':
-                op = []
-                w = []
-                for i in xrange(N):
-                    yval = round(pulp.value(y[i]),self.dom)
-                    if yval != 0:
-                        op.append(clone[i])
-                        w.append(yval)
-                return wpolyanna.wop.WeightedOperation(arity,self.dom,op,w)
-            
-        # Return false if we couldn't find a separating wop
-        return False
-        
 # Global functions
-def wpol(cost_functions,arity,clone=None,multimorphisms=False):
+def orbit_ineq(A,clone):
+    """ Restrict a set of inequalities to symmetric weighted operations.
+
+    A weighted operation is symmetric if permuting the arguments of its
+    operations does not change it, i.e. its weights are constant on
+    each orbit of the clone under permuting arguments. The weighted
+    polymorphisms are closed under permuting arguments, so averaging
+    over the permutations maps every weighted polymorphism to a
+    symmetric one.
+
+    :param A: Inequalities in the style of cdd, with a constant column
+        followed by a column for each operation in the clone.
+    :type A: :class:`InequalityMatrix`
+    :param clone: The supporting clone.
+    :type clone: :class:`Clone`
+    :returns: A pair (reps,B), where reps is the list of the indices of
+        the orbit representatives (see :meth:`Clone.orbits`) and B holds
+        the inequalities on the common weight of each orbit, with a
+        column for each representative.
+    :rtype: (:py:func:`list` of integer, :class:`InequalityMatrix`)
+
+    .. note:: Use :meth:`WeightedOperation.expand_orbits` to obtain
+        the weighted operation from its weights on the representatives.
+    """
+    (reps,orbit) = clone.orbits()
+    M = A.to_array()
+    B = InequalityMatrix()
+    if len(M) > 0:
+        B.extend(numpy.hstack([M[:,:1],clone.orbit_sums(M[:,1:])]))
+    return reps,B
+
+def separate_task(c):
+    """ Solve the separation program shared with a worker process for
+    one inequality (see :meth:`CostFunction.wpol_separate`). """
+    return parallel.shared['lp'].solve(c)
+
+def wpol_ineq_task(cf):
+    """ Return the weighted polymorphism inequalities of a cost function
+    over the clone shared with a worker process (see :func:`wpol`). """
+    return cf.wpol_ineq(parallel.shared['arity'],parallel.shared['clone'])
+
+def wpol(cost_functions,arity,clone=None,multimorphisms=False,
+         symmetric=False,workers=None):
     """ Return the weighted polymorphisms.
 
     This method obtains the matrix of inequalities defining the
@@ -289,6 +529,15 @@ def wpol(cost_functions,arity,clone=None,multimorphisms=False):
     :param multimorphisms: Flag to request we only generate
         multimorphisms.
     :type multimorphisms: boolean, optional
+    :param symmetric: Flag to request only symmetric weighted
+        polymorphisms, computed with one variable per orbit (see
+        :func:`orbit_ineq`).
+    :type symmetric: boolean, optional
+    :param workers: The number of processes used to compute the
+        inequalities of the cost functions. The clone is shared with
+        each process once, and the rows are merged in the order of
+        cost_functions, so the result does not depend on workers.
+    :type workers: integer, optional
 
     .. note:: We implicitly assume that any clone passed in to the
         function is a subset of the set of feasibility polymorphisms.
@@ -304,7 +553,9 @@ def wpol(cost_functions,arity,clone=None,multimorphisms=False):
     if clone is None:
         clone = Clone.all_operations(arity,d)
     N = len(clone)
-    A = cost_functions[0].wop_ineq(arity,clone)
+    A = InequalityMatrix()
+    for B in cost_functions[0].wop_rows(arity,clone):
+        A.extend(B)
 
     # If we are only looking for multimorphisms, then we
     # have all projections with weight exactly 1
@@ -312,29 +563,33 @@ def wpol(cost_functions,arity,clone=None,multimorphisms=False):
         for i in range(arity):
             row = [1] + [0 for _ in range(N)]
             row[i+1] = 1
-            A.append(row)
+            A.add(row)
             row = [-1] + [0 for _ in range(N)]
             row[i+1] = -1
-            A.append(row)
+            A.add(row)
 
     # Get the weighted polymorphism inequalities for each
     # cost function
-    for cf in cost_functions:
-        # Get the weighted polymorphism inequalities
-        for row in cf.wpol_ineq(arity,clone):
-            if not row in A:
-                A.append(row)
+    state = {'arity': arity, 'clone': clone}
+    for rows in parallel.pool_map(wpol_ineq_task,cost_functions,workers,
+                                  state):
+        A.extend(rows)
+
+    if symmetric:
+        (reps,A) = orbit_ineq(A,clone)
+    else:
+        reps = range(N)
                           
-    poly = cdd.Polyhedron(cdd.Matrix(A))
+    poly = cdd.Polyhedron(A.to_cdd())
     ray_mat = poly.get_generators()
     W = []
     for i in range(ray_mat.row_size):
         weights = []
         ops = []
-        for j in range(N):
+        for j in range(len(reps)):
             rval = round(ray_mat[i][j+1],d)
             if rval != 0:
                 weights.append(-rval)
-                ops.append(clone[j])
+                ops.append(clone[reps[j]])
         W.append(wpolyanna.wop.WeightedOperation(arity,d,ops,weights))
     return W
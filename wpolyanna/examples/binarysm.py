@@ -153,7 +153,7 @@ def check_submodular(gamma):
 
     sm = Submodular()
 
-    if sm.improves(gamma):
+    if sm.is_wpol(gamma):
         print "%s is submodular." % str(gamma)
     else:
         print "%s is not submodular." % str(gamma)
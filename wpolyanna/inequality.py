@@ -0,0 +1,311 @@
+import cdd
+import pulp
+import numpy
+
+class InequalityMatrix:
+    """ A matrix of inequalities in which each row is stored once.
+
+    Rows are kept in the order they were first added, and a dictionary
+    from each row to its position is used to reject duplicates, so
+    adding a row takes constant time.
+
+    :param rows: The initial rows.
+    :type rows: :py:func:`list` of :py:func:`list`, or a 2-dimensional
+        :class:`numpy.ndarray`, Optional
+    """
+
+    def __init__(self,rows=None):
+        self.rows = []
+        self.index = dict()
+        if rows is not None:
+            self.extend(rows)
+
+    def add(self,row):
+        """ Add a row, unless it is already in the matrix.
+
+        :param row: The row.
+        :type row: sequence of rational
+        :returns: True if the row was added, False if it was already
+            present.
+        :rtype: boolean
+        """
+        key = tuple(row)
+        if key in self.index:
+            return False
+        self.index[key] = len(self.rows)
+        self.rows.append(list(key))
+        return True
+
+    def extend(self,rows):
+        """ Add each of a collection of rows.
+
+        :param rows: The rows.
+        :type rows: iterable of sequences, or a 2-dimensional
+            :class:`numpy.ndarray`
+        :returns: The number of rows which were added.
+        :rtype: integer
+        """
+        if isinstance(rows,numpy.ndarray):
+            rows = rows.tolist()
+        n = len(self.rows)
+        for row in rows:
+            self.add(row)
+        return len(self.rows) - n
+
+    def sort(self):
+        """ Sort the rows lexicographically. """
+        self.rows.sort()
+        self.index = dict((tuple(row),i) for (i,row) in enumerate(self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self,i):
+        return self.rows[i]
+
+    def __contains__(self,row):
+        return tuple(row) in self.index
+
+    def __repr__(self):
+        return "InequalityMatrix(" + repr(self.rows) + ")"
+
+    def to_list(self):
+        """ Return the rows as a list of lists.
+
+        :rtype: :py:func:`list` of :py:func:`list`
+        """
+        return [list(row) for row in self.rows]
+
+    def to_array(self,dtype=None):
+        """ Return the rows as a NumPy array.
+
+        :param dtype: The type of the entries.
+        :type dtype: :class:`numpy.dtype`, Optional
+        :rtype: :class:`numpy.ndarray`
+        """
+        return numpy.array(self.rows,dtype=dtype)
+
+    def to_cdd(self,rep_type=None):
+        """ Return the rows as a cdd matrix.
+
+        :param rep_type: The representation type of the matrix. If not
+            given, cdd treats the rows as inequalities.
+        :type rep_type: :class:`cdd.RepType`, Optional
+        :rtype: :class:`cdd.Matrix`
+        """
+        mat = cdd.Matrix(self.rows)
+        if rep_type is not None:
+            mat.rep_type = rep_type
+        return mat
+
+    def lp_constraints(self,x,offset=0,sense=pulp.LpConstraintLE,rhs=0):
+        """ Return the rows as linear constraints on LP variables.
+
+        The constraint for a row a is sum_j a[j+offset]*x[j] (sense) rhs.
+
+        :param x: The variables, indexed by column.
+        :type x: :py:class:`dict` or :py:func:`list` of
+            :class:`pulp.LpVariable`
+        :param offset: The number of leading entries of each row to
+            skip, e.g. 1 for rows with a constant column in the style
+            of cdd.
+        :type offset: integer, Optional
+        :param sense: The sense of the constraints.
+        :type sense: one of the pulp.LpConstraint constants, Optional
+        :param rhs: The right hand side of each constraint.
+        :type rhs: rational, Optional
+        :returns: The constraints, in the order of the rows.
+        :rtype: :py:func:`list` of :class:`pulp.LpConstraint`
+        """
+        C = []
+        for row in self.rows:
+            e = pulp.LpAffineExpression([(x[j],row[j+offset])
+                                         for j in range(len(row)-offset)
+                                         if row[j+offset] != 0])
+            C.append(pulp.LpConstraint(e,sense,rhs=rhs))
+        return C
+
+class SeparationLP:
+    """ A linear program looking for a point x with a.x <= 0 for each
+    row a of a fixed matrix and c.x >= 1 for a row c which changes
+    between solves.
+
+    The fixed constraints are built once. Each call to :meth:`solve`
+    only replaces the constraint for c and solves the problem from
+    scratch, since a solver which resolves in process would keep the
+    old constraint.
+
+    :param A: The fixed rows.
+    :type A: :class:`InequalityMatrix` or :py:func:`list` of
+        :py:func:`list`
+    :param offset: The number of leading entries of each row to skip,
+        e.g. 1 for rows with a constant column in the style of cdd.
+    :type offset: integer, Optional
+    :param solver: The solver. If not given, the default solver of
+        pulp is used.
+    :type solver: :class:`pulp.LpSolver`, Optional
+    """
+
+    def __init__(self,A,offset=0,solver=None):
+        self.rows = [list(row) for row in A]
+        self.offset = offset
+        self.solver = solver
+        self.prob = None
+
+    def __getstate__(self):
+        # The problem is rebuilt by each process which solves it
+        return (self.rows,self.offset,self.solver)
+
+    def __setstate__(self,state):
+        (self.rows,self.offset,self.solver) = state
+        self.prob = None
+
+    def problem(self,n):
+        """ Return the problem with the fixed constraints.
+
+        :param n: The number of variables.
+        :type n: integer
+        :rtype: :class:`pulp.LpProblem`
+        """
+        if self.prob is None:
+            self.prob = pulp.LpProblem()
+            self.x = pulp.LpVariable.dicts("x",xrange(n))
+            # No objective function
+            self.prob += 0
+            for a in InequalityMatrix(self.rows).lp_constraints(
+                self.x,self.offset):
+                self.prob += a
+            if self.solver is not None:
+                self.prob.setSolver(self.solver)
+        return self.prob
+
+    def solve(self,c):
+        """ Find a point satisfying the fixed inequalities and violating
+        another one.
+
+        :param c: The inequality to violate.
+        :type c: sequence of rational
+        :returns: A point x with a.x <= 0 for each fixed row a and
+            c.x >= 1, or None if there is no such point.
+        :rtype: :py:func:`list` of float
+        """
+        n = len(c) - self.offset
+        prob = self.problem(n)
+        if "violate" in prob.constraints:
+            del prob.constraints["violate"]
+        prob += (InequalityMatrix([c]).lp_constraints(
+            self.x,self.offset,pulp.LpConstraintGE,1)[0],"violate")
+        prob.solve()
+        if pulp.LpStatus[prob.status] == 'Optimal':
+            return [pulp.value(self.x[i]) for i in xrange(n)]
+        return None
+
+class MembershipLP:
+    """ A linear program deciding if a vector b is a non-negative
+    combination of the rows of a matrix A.
+
+    The program minimises the total deviation sum_j |(yA - b)_j| over
+    y >= 0, so it is always feasible. Its value is 0 if and only if b is
+    in the cone generated by the rows. Otherwise, the dual values z of
+    the equality constraints satisfy A z <= 0 and b.z > 0, which is the
+    certificate given by Farkas' lemma. So one solve answers the
+    question either way.
+
+    The right hand side b is only set when solving, with
+    :meth:`pulp.LpConstraint.changeRHS`, so the same problem can be
+    solved for many vectors, and a solver which resolves in process is
+    given the new right hand side. Adding rows rebuilds the problem.
+
+    :param A: The rows.
+    :type A: :py:func:`list` of :py:func:`list`
+    :param n: The number of columns.
+    :type n: integer
+    :param solver: The solver. If not given, the default solver of
+        pulp is used.
+    :type solver: :class:`pulp.LpSolver`, Optional
+    """
+
+    # The largest optimal value treated as 0
+    tol = 1e-6
+
+    def __init__(self,A,n,solver=None):
+        self.rows = []
+        self.n = n
+        self.solver = solver
+        self.prob = None
+        self.add_rows(A)
+
+    def __getstate__(self):
+        # The problem is rebuilt by each process which solves it
+        return (self.rows,self.n,self.solver)
+
+    def __setstate__(self,state):
+        (self.rows,self.n,self.solver) = state
+        self.prob = None
+
+    def problem(self):
+        """ Return the problem, with a right hand side of 0.
+
+        :rtype: :class:`pulp.LpProblem`
+        """
+        if self.prob is None:
+            self.prob = pulp.LpProblem()
+            # The deviation in each coordinate
+            self.sp = pulp.LpVariable.dicts("sp",xrange(self.n),0)
+            self.sm = pulp.LpVariable.dicts("sm",xrange(self.n),0)
+            self.prob += (pulp.lpSum(self.sp.values())
+                          + pulp.lpSum(self.sm.values()))
+            self.y = [pulp.LpVariable("y%d" % k,0)
+                      for k in xrange(len(self.rows))]
+            terms = [[] for _ in xrange(self.n)]
+            for (y,row) in zip(self.y,self.rows):
+                for j in xrange(self.n):
+                    if row[j] != 0:
+                        terms[j].append((y,row[j]))
+            for j in xrange(self.n):
+                e = pulp.LpAffineExpression(terms[j])
+                self.prob += (e + self.sp[j] - self.sm[j] == 0,"c%d" % j)
+            if self.solver is not None:
+                self.prob.setSolver(self.solver)
+        return self.prob
+
+    def add_rows(self,A):
+        """ Add rows to the matrix.
+
+        :param A: The new rows.
+        :type A: :py:func:`list` of :py:func:`list`
+
+        .. note:: The problem is rebuilt by the next solve, since pulp
+            does not pass new terms of a constraint to a solver which
+            resolves.
+        """
+        n = len(self.rows)
+        self.rows.extend(list(row) for row in A)
+        if len(self.rows) > n:
+            self.prob = None
+
+    def solve(self,b):
+        """ Decide if a vector is a non-negative combination of the
+        rows.
+
+        :param b: The vector.
+        :type b: sequence of rational
+        :returns: (True,y) where y gives the weight of each row in the
+            combination, or (False,z) where z is a vector with
+            A z <= 0 and b.z > 0.
+        :rtype: (boolean, :py:func:`list` of float)
+        """
+        prob = self.problem()
+        for j in xrange(self.n):
+            prob.constraints["c%d" % j].changeRHS(b[j])
+        if prob.solver is None:
+            prob.solve()
+        else:
+            prob.resolve()
+        if pulp.value(prob.objective) <= self.tol:
+            return (True,[y.varValue for y in self.y])
+        return (False,[prob.constraints["c%d" % j].pi
+                       for j in xrange(self.n)])
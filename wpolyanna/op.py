@@ -1,6 +1,34 @@
 from itertools import product, combinations
 
+import numpy
+
 from wpolyanna.exception import *
+from wpolyanna.util import table_dtype, tuple_index, tuple_array, radix
+from wpolyanna.cache import cached
+
+def compose_tables(table,tables,dom):
+    """ Compose value tables.
+
+    The i-th rows of the inner tables are read as the digits of an
+    index into the outer table, so the whole composition is a single
+    gather. Any number of compositions with the same outer operation
+    can be computed at once by stacking the inner tables.
+
+    :param table: the value table of an operation of arity m
+    :type table: :class:`numpy.ndarray`
+    :param tables: the value tables of m operations of the same arity,
+        with shape (m,n), or a stack of these with shape (...,m,n)
+    :type tables: :class:`numpy.ndarray` or list of tables
+    :param dom: the domain size
+    :returns: the value table(s) of the compositions, with shape (...,n)
+    :rtype: :class:`numpy.ndarray`
+    """
+    tables = numpy.asarray(tables)
+    index = numpy.zeros(tables.shape[:-2]+tables.shape[-1:],dtype=numpy.intp)
+    for i in range(tables.shape[-2]):
+        index *= dom
+        index += tables[...,i,:]
+    return table[index]
 
 class Operation:
     """
@@ -18,6 +46,8 @@ class Operation:
         """
         self.arity = arity
         self.dom = dom
+        self.table = None
+        self.fp = None
 
     def __eq__(self,other):
         """         
@@ -29,25 +59,38 @@ class Operation:
         """
         if self.arity != other.arity or self.dom != other.dom:
             return False
+        elif self.fingerprint() != other.fingerprint():
+            return False
         else:            
-            for x in product(range(self.dom),repeat=self.arity):
-                if self[x] != other[x]:
-                    return False
-            return True
+            return numpy.array_equal(self.value_table(),other.value_table())
+
+    def __ne__(self,other):
+        """ Test for disequality. """
+        return not self == other
 
     def __hash__(self):
         """ 
         :returns: the hash value of this operation
         :rtype: integer
         
-        .. note:: This method must return the sum of the tuple of output values
-        of this Operation. This is to ensure that we can compare
-        instances of subclasses that are equal, but have different
-        classes.
-        .. warning:: This method is *abstract* and must be implemented by
-            every subclass. 
+        .. note:: This is the fingerprint of the operation, so instances
+            of different subclasses computing the same function have the
+            same hash value.
         """
-        return sum(self.value_tuple())
+        return self.fingerprint()
+
+    def fingerprint(self):
+        """ Return the fingerprint of this operation.
+
+        :returns: a hash of the arity, domain size and value table. This
+            is computed once and stored, so depends only on the function
+            computed by the operation and not on its class.
+        :rtype: integer
+        """
+        if self.fp is None:
+            self.fp = hash((self.arity,self.dom,
+                            self.value_table().tostring()))
+        return self.fp
 
     def __getitem__(self,x):
         """ 
@@ -146,6 +189,7 @@ class Operation:
             elif f.dom < self.dom:
                 raise DomainError(self.dom-f.dom)
             
+    @cached
     def compose(self,F):
         """ Compose with a list of operations
         
@@ -158,11 +202,18 @@ class Operation:
             of that subclass.  
         """
         self.check_compose(F)
-        f = dict()
-        k = F[0].arity
-        for x in product(range(self.dom),repeat=k):
-            f[x] = self[tuple(F[i][x] for i in range(self.arity))]
-        return ExplicitOperation(k,self.dom,f)
+        return TableOperation(F[0].arity,self.dom,
+                              self.compose_table(F)).to_explicit()
+
+    def compose_table(self,F):
+        """ Compute the value table of a composition.
+
+        :param F: a list of Operations to compose with
+        :returns: the value table of self(g1,g2,...,gk)
+        :rtype: :class:`numpy.ndarray`
+        """
+        return compose_tables(self.value_table(),
+                              [f.value_table() for f in F],self.dom)
 
     def restrict(self,A):
         """ Restrict the domain
@@ -184,6 +235,21 @@ class Operation:
         k = self.arity
         return tuple(self[x] for x in product(range(d),repeat=k))
 
+    def value_table(self):
+        """ Return the value-table representation
+
+        :returns: the output values of this Operation, in the same order
+            as :meth:`value_tuple`.
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: The table is computed on the first call and stored,
+            so operations must not be modified after it is used.
+        """
+        if self.table is None:
+            self.table = numpy.array(self.value_tuple(),
+                                     dtype=table_dtype(self.dom))
+        return self.table
+
     def check_input(self,x):
         # Error checking
         if len(x) != self.arity:
@@ -243,7 +309,144 @@ class ExplicitOperation(Operation):
             the operation.
         """
         return str(self.f)
-    
+
+class TableOperation(Operation):
+    """
+    A class for an operation defined by a flat table of output
+    values. The value on an input x is stored at the position of x in
+    the lexicographic ordering of all inputs (the mixed-radix encoding
+    of x in base dom), using the smallest unsigned integer type which
+    can hold the domain. This is much more compact than the dictionary
+    used by ExplicitOperation, and allows whole tableaux to be
+    evaluated at once.
+
+    :param arity: The arity.
+    :type arity: integer
+    :param dom: The size of the domain.
+    :type dom: integer
+    :param table: The output values, in lexicographic order of the
+        inputs.
+    :type table: sequence of integers
+    """
+
+    def __init__(self,arity,dom,table):
+        """
+        Create a new TableOperation object.
+        """
+        Operation.__init__(self,arity,dom)
+        self.table = numpy.asarray(table,dtype=table_dtype(dom))
+
+    @staticmethod
+    def from_dict(arity,dom,f):
+        """ Create a TableOperation from the mapping used by
+        ExplicitOperation.
+
+        :param f: The mapping defining the operation.
+        :type f: :py:class:`dict` mapping :py:func:`tuple` of integers to
+            integers.
+        :rtype: :class:`TableOperation`
+        """
+        return TableOperation(arity,dom,
+                              [f[x] for x in product(range(dom),
+                                                     repeat=arity)])
+
+    @staticmethod
+    def from_operation(f):
+        """ Create a TableOperation computing the same function as
+        another operation.
+
+        :param f: The operation to convert.
+        :type f: :class:`Operation`
+        :rtype: :class:`TableOperation`
+        """
+        return TableOperation(f.arity,f.dom,f.value_table())
+
+    def to_dict(self):
+        """ Return the mapping from inputs to outputs.
+
+        :rtype: :py:class:`dict` mapping :py:func:`tuple` of integers to
+            integers.
+        """
+        return dict(zip(product(range(self.dom),repeat=self.arity),
+                        self.table.tolist()))
+
+    def to_explicit(self):
+        """ Return an ExplicitOperation computing the same function.
+
+        :rtype: :class:`ExplicitOperation`
+        """
+        f = ExplicitOperation(self.arity,self.dom,self.to_dict())
+        f.table = self.table
+        return f
+
+    def __getitem__(self,x):
+        """ Apply this operation to a tuple.
+
+        :returns: the value stored at the index of x
+        :rtype: integer
+        """
+        Operation.check_input(self,x)
+        return self.table.item(tuple_index(x,self.dom))
+
+    def apply_to_tableau(self,X):
+        """ Apply this operation to the columns of a tableau.
+
+        Every column of X is encoded as an index into the table, so the
+        whole tableau is evaluated with a single lookup.
+        """
+        X = numpy.asarray(X)
+        if X.ndim != 2 or len(X) != self.arity:
+            raise ArityError(len(X),self.arity)
+        if X.size > 0:
+            if X.min() < 0:
+                raise DomainError(X.min())
+            elif X.max() >= self.dom:
+                raise DomainError(X.max()-self.dom)
+        return tuple(self.table[radix(self.arity,self.dom).dot(X)].tolist())
+
+    def value_tuple(self):
+        """ Return the value-tuple representation
+
+        :returns: the tuple of output values of this Operation.
+        """
+        return tuple(self.table.tolist())
+
+    @cached
+    def compose(self,F):
+        """ Compose with a list of operations
+
+        :param F: a list of Operations to compose with
+        :returns: The operation self(g1,g2,...,gk)
+        :rtype: :class:`TableOperation`
+        """
+        self.check_compose(F)
+        return TableOperation(F[0].arity,self.dom,self.compose_table(F))
+
+    def is_projection(self):
+        """ Test if this operation is a projection, by comparing the
+        table with each column of the table of inputs.
+        """
+        X = tuple_array(self.arity,self.dom)
+        for i in range(self.arity):
+            if numpy.array_equal(self.table,X[:,i]):
+                return True
+        return False
+
+    def __repr__(self):
+        """ Return a string representation of this instance of
+        TableOperation.
+        """
+        return "TableOperation(%d, %d, %s)" % (self.arity,
+                                               self.dom,
+                                               repr(self.table.tolist()))
+
+    def __str__(self):
+        """ Return a string containing a description of this operation.
+
+        :returns: A string representation of the table of output values.
+        """
+        return str(self.table.tolist())
+
 class Projection(Operation):
     """
     A class representing a projection operation. This is an operation
@@ -302,16 +505,15 @@ class Projection(Operation):
         else:
             return Operation.__eq__(self,other)
 
-    def __hash__(self):
-        """ Return the hash value of this operation.
-
-        :returns: the hash value of this operation. 
-        :rtype: integer
+    def value_table(self):
+        """ Return the value-table representation, which is the
+        index-th column of the table of inputs.
         """
-        d = self.dom
-        k = self.arity
-        return sum(i*(d**(k-1)) for i in range(d))
-    
+        if self.table is None:
+            X = tuple_array(self.arity,self.dom)
+            self.table = numpy.ascontiguousarray(X[:,self.index])
+        return self.table
+
     def is_projection(self):
         return True
 
@@ -0,0 +1,94 @@
+import multiprocessing
+
+# The state shared by the tasks run in a worker process. It is set once
+# per process by init_worker, so large objects such as clones are not
+# sent with every task.
+shared = dict()
+
+def init_worker(state):
+    """ Set the state shared by the tasks run in this process.
+
+    :param state: the shared objects, by name
+    :type state: :py:class:`dict`
+    """
+    shared.clear()
+    shared.update(state)
+
+def pool_map(f,items,workers,state=None):
+    """ Apply a function to each of a list of items in a pool of
+    processes.
+
+    :param f: a module-level function of one argument, which may read
+        the objects in :data:`shared`
+    :param items: the arguments
+    :type items: :py:func:`list`
+    :param workers: the number of processes. If this is None or 1, the
+        items are processed in this process.
+    :type workers: integer
+    :param state: the objects to share with every task
+    :type state: :py:class:`dict`, Optional
+    :returns: the list of results, in the order of items
+    :rtype: :py:func:`list`
+
+    .. note:: On platforms which fork, the shared state is inherited by
+        the workers and never pickled. Otherwise it is pickled once
+        per worker.
+    """
+    if state is None:
+        state = dict()
+    if workers is None or workers <= 1 or len(items) <= 1:
+        old = dict(shared)
+        init_worker(state)
+        try:
+            return map(f,items)
+        finally:
+            init_worker(old)
+    pool = multiprocessing.Pool(min(workers,len(items)),init_worker,(state,))
+    try:
+        return pool.map(f,items)
+    finally:
+        pool.close()
+        pool.join()
+
+def pool_first(f,items,workers,state=None):
+    """ Return the first result of applying a function to a list of
+    items which is not None.
+
+    :param f: a module-level function of one argument, which may read
+        the objects in :data:`shared`
+    :param items: the arguments, in the order they should be tried
+    :type items: :py:func:`list`
+    :param workers: the number of processes. If this is None or 1, the
+        items are processed in this process.
+    :type workers: integer
+    :param state: the objects to share with every task
+    :type state: :py:class:`dict`, Optional
+    :returns: the result for the first item, in the order of items,
+        whose result is not None, or None if there is no such item
+
+    .. note:: The items are run ahead in the pool, and the pool is
+        terminated as soon as the answer is known. Since the results
+        are read in order, the answer is the one the serial loop gives.
+    """
+    if state is None:
+        state = dict()
+    if workers is None or workers <= 1 or len(items) <= 1:
+        old = dict(shared)
+        init_worker(state)
+        try:
+            for x in items:
+                r = f(x)
+                if r is not None:
+                    return r
+            return None
+        finally:
+            init_worker(old)
+    pool = multiprocessing.Pool(min(workers,len(items)),init_worker,(state,))
+    try:
+        for r in pool.imap(f,items):
+            if r is not None:
+                return r
+        return None
+    finally:
+        pool.terminate()
+        pool.join()
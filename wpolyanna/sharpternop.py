@@ -1,6 +1,8 @@
 from itertools import product, permutations
 import wpolyanna
 from wpolyanna import Operation, Projection
+from wpolyanna.util import tuple_index
+from wpolyanna.cache import cached
 
 
 class SharpTernary(Operation):
@@ -43,8 +45,10 @@ class SharpTernary(Operation):
     def __repr__(self):
         return "SharpTernary(%d,%s,%s)" % (self.dom,str(self.pos),str(self.vals))
 
+    @cached
     def compose(self,F):
         F = list(F)
+        table = self.compose_table(F)
         
         # Convert all projections to SharpTernary objects
         for i in [0,1,2]: 
@@ -73,11 +77,13 @@ class SharpTernary(Operation):
         pos[2] = self[c]
 
         # Compute the values for distinct inputs
-        vals = {}
-        for x in permutations(range(self.dom),3):
-            vals[x] = self[F[0][x],F[1][x],F[2][x]]
-        
-        return SharpTernary(self.dom,pos,vals)
+        X = list(permutations(range(self.dom),3))
+        vals = dict(zip(X,table[[tuple_index(x,self.dom)
+                                 for x in X]].tolist()))
+
+        f = SharpTernary(self.dom,pos,vals)
+        f.table = table
+        return f
 
 # Functions for creating the sharp ternary operations of the different types
 def majority(dom,vals):
@@ -1,6 +1,13 @@
 import string
+import itertools as it
+
+import numpy
 
 from wpolyanna import Operation, Projection, Clone, WeightedOperation, CostFunction
+from wpolyanna.cache import cached
+from wpolyanna.util import tuple_array, table_dtype, radix
+from wpolyanna import parallel
+import wpolyanna.wop
 
 class MinMax(Operation):
     """ A class for min/max operations
@@ -20,16 +27,81 @@ class MinMax(Operation):
     :type dom: :class:`int`
     
     .. note:: The default operation is max(x).    
+
+    .. note:: The family is stored as the sorted tuple self.masks of
+        bitmasks of its sets, where element i is the bit
+        2**(arity-1-i). So the bitmask of a set is the index of its
+        indicator tuple in the value table, and s is a subset of t if
+        and only if s & t == s.
     """
     
+    # The clones returned by MinMax.clone, by arity and domain size
+    clones = dict()
+
     def __init__(self,arity,S=None,dom=2):
         """ Create a new min/max operation. """
         Operation.__init__(self,arity,dom)
 
         # Default operation
         if S is None:
-            S = frozenset(frozenset([i]) for i in range(arity))
-        self.S = frozenset(MinMax.sperner(map(lambda s: frozenset(s),S)))
+            S = [[i] for i in range(arity)]
+        self.masks = MinMax.antichain([MinMax.mask(s,arity) for s in S],
+                                      arity)
+
+    @staticmethod
+    def from_masks(arity,masks,dom=2):
+        """ Create a min/max operation from the bitmasks of a family of
+        sets, which need not be a Sperner family.
+
+        :param arity: The arity of the operation.
+        :type arity: :class:`int`
+        :param masks: The bitmasks of the sets.
+        :type masks: iterable of :class:`int`
+        :param dom: The size of the domain.
+        :type dom: :class:`int`, Optional
+        :rtype: :class:`MinMax`
+        """
+        f = MinMax(arity,[],dom)
+        f.masks = MinMax.antichain(masks,arity)
+        return f
+
+    @staticmethod
+    def mask(s,arity):
+        """ Return the bitmask of a set.
+
+        :param s: A subset of range(arity).
+        :type s: iterable of :class:`int`
+        :param arity: The arity.
+        :type arity: :class:`int`
+        :rtype: :class:`int`
+        """
+        m = 0
+        for i in s:
+            m |= 1 << (arity-1-i)
+        return m
+
+    @staticmethod
+    def elements(m,arity):
+        """ Return the elements of the set with a given bitmask.
+
+        :param m: The bitmask.
+        :type m: :class:`int`
+        :param arity: The arity.
+        :type arity: :class:`int`
+        :returns: The elements, in increasing order.
+        :rtype: :py:func:`list` of :class:`int`
+        """
+        return [i for i in range(arity) if m >> (arity-1-i) & 1]
+
+    def family(self):
+        """ Return the Sperner family of this operation.
+
+        :rtype: :class:`frozenset` of :class:`frozenset` of :class:`int`
+        """
+        return frozenset(frozenset(MinMax.elements(m,self.arity))
+                         for m in self.masks)
+
+    S = property(family)
 
     def __getitem__(self,x):
         """ Return max(t(x) t in S), where each t is a min-term.
@@ -37,33 +109,43 @@ class MinMax(Operation):
         :param x: the input
         """
         Operation.check_input(self,x)
-        return max([min([x[i] for i in s]) for s in self.S])
+        return max([min([x[i] for i in MinMax.elements(m,self.arity)])
+                    for m in self.masks])
+
+    def value_table(self):
+        """ Return the value-table representation, computed with one
+        minimum over the columns of the table of inputs for each set in
+        the family.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        if self.table is None:
+            X = tuple_array(self.arity,self.dom)
+            table = numpy.zeros(len(X),dtype=X.dtype)
+            for m in self.masks:
+                numpy.maximum(table,
+                              X[:,MinMax.elements(m,self.arity)].min(axis=1),
+                              out=table)
+            self.table = table
+        return self.table
 
     def __str__(self):
         """ Return a string representation of this operation."""
         # We assume empty S is a constant operation
-        if len(self.S) == 0:
+        if len(self.masks) == 0:
             return "0"
-        # Need to allow random access
-        S = tuple(self.S)
-        if len(S) == 1:
-            if len(S[0]) == 1:
-                return "x[%d]" % tuple(S[0])[0]
+        as_str = []
+        for s in sorted(MinMax.elements(m,self.arity) for m in self.masks):
+            if len(s) == 1:
+                as_str.append("x[%d]" % tuple(s))
             else:
-                return (string.join(["min(x[%d]"]
-                                    + [",x[%d]"]*(len(S[0])-1)
-                                    + [")"],'') % tuple(S[0]))
-        else:
-            as_str = []
-            for s in self.S:
-                if len(s) == 1:
-                    as_str.append("x[%d]" % tuple(s))
-                else:
-                    as_str.append(string.join(["min(x[%d]"] 
-                                              + [",x[%d]"]*(len(s)-1)
-                                              + [")"],'') % tuple(s))
-            return (string.join(["max(%s"] + [",%s"]*(len(self.S)-1)
-                                + [")"],'') % tuple(as_str))
+                as_str.append(string.join(["min(x[%d]"] 
+                                          + [",x[%d]"]*(len(s)-1)
+                                          + [")"],'') % tuple(s))
+        if len(as_str) == 1:
+            return as_str[0]
+        return (string.join(["max(%s"] + [",%s"]*(len(as_str)-1)
+                            + [")"],'') % tuple(as_str))
     
     def __eq__(self,other):
         """
@@ -77,7 +159,7 @@ class MinMax(Operation):
         :type other: :class:`Operation`
         """
         if other.__class__.__name__ == "MinMax":
-            return self.S == other.S
+            return self.masks == other.masks
         else:
             return Operation.__eq__(self,other)
 
@@ -87,7 +169,7 @@ class MinMax(Operation):
         :param other: The other operation.
         :type other: :class:`Operation`
         """
-        return self.S != other.S
+        return not self == other
     
     def __le__(self,other):
         """
@@ -100,11 +182,13 @@ class MinMax(Operation):
         :param other: The other operation.
         :type other: :class:`MinMax`
         """
-        if len(self.S) == 0:
-            return True
-        if len(self.S) > 0 and len(other.S) == 0:
-            return False
-        return min([max([t <= s for t in other.S]) for s in self.S])
+        for s in self.masks:
+            for t in other.masks:
+                if t & s == t:
+                    break
+            else:
+                return False
+        return True
 
     def __lt__(self,other):
         """ Test if this operation is strictly less than another.
@@ -141,8 +225,8 @@ class MinMax(Operation):
         :type other: :class:`MinMax`
         :rtype: :class:`MinMax`
         """
-        return MinMax(self.arity,MinMax.sperner(self.S.union(other.S)),
-                      self.dom)
+        return MinMax.from_masks(self.arity,self.masks + other.masks,
+                                 self.dom)
 
     def __mul__(self,other):
         """
@@ -153,10 +237,10 @@ class MinMax(Operation):
         :type other: :class:`MinMax`
         :rtype: :class:`MinMax`
         """
-        return MinMax(self.arity,
-                      MinMax.sperner([s.union(t) for s in self.S for t in
-                                      other.S]),
-                      self.dom) 
+        return MinMax.from_masks(self.arity,
+                                 [s | t for s in self.masks
+                                  for t in other.masks],
+                                 self.dom)
     
     def is_projection(self):
         """
@@ -165,11 +249,10 @@ class MinMax(Operation):
         Returns true if the Sperner family contains a single singleton
         set. 
         """
-        if len(self.S) != 1:
-            return False
-        S = tuple(self.S)
-        return len(S[0]) == 1
+        return (len(self.masks) == 1 and self.masks[0] != 0
+                and self.masks[0] & (self.masks[0]-1) == 0)
 
+    @cached
     def compose(self,F):
         """
         Compose this operation with a list of operations.
@@ -185,14 +268,16 @@ class MinMax(Operation):
         """
 
         if not min([f.__class__.__name__ == "MinMax" for f in F]):
-            return Operation.compose(self,F)
-        f = MinMax(F[0].arity,[],self.dom)
-        for s in map(tuple,self.S):
-            t = F[s[0]]
+            return Operation.compose.uncached(self,F)
+        masks = []
+        for m in self.masks:
+            s = MinMax.elements(m,self.arity)
+            T = F[s[0]].masks
             for i in s[1:]:
-                t = t * F[i]
-            f = f + t
-        return f
+                T = MinMax.antichain([a | b for a in T for b in F[i].masks],
+                                     F[0].arity)
+            masks.extend(T)
+        return MinMax.from_masks(F[0].arity,masks,self.dom)
 
     def below(self):
         """
@@ -203,18 +288,89 @@ class MinMax(Operation):
         Sperner family, in the lattice of all Sperner families on a
         fixed set. 
         """
-        S = tuple(self.S)
         k = self.arity
         ops = []
-        for s in S:
-            T = self.S - set([s])
-            for i in set(range(k)) - s:
-                T = T.union([s.union([i])])
-            T = MinMax.sperner(T)
-            if T != S and len(T) > 0:
-                ops.append(MinMax(k,T,self.dom))
+        for s in self.masks:
+            T = [t for t in self.masks if t != s]
+            T.extend(s | (1 << i) for i in range(k) if not s >> i & 1)
+            T = MinMax.antichain(T,k)
+            if T != self.masks and len(T) > 0:
+                f = MinMax(k,[],self.dom)
+                f.masks = T
+                ops.append(f)
         return set(ops)
 
+    @staticmethod
+    def antichain(masks,arity):
+        """
+        Return the minimal elements of a family of sets, given by their
+        bitmasks.
+
+        The sets containing some set of the family form an up-set,
+        stored as a bitset over all 2**arity subsets, so it is the
+        union of the bitwise and of one bitset per element (see
+        :func:`element_sets`). A set of the up-set is minimal if
+        removing any one of its elements leaves the up-set, so the
+        minimal elements are found with one shift per element.
+
+        :param masks: The bitmasks.
+        :type masks: iterable of :class:`int`
+        :param arity: The number of elements.
+        :type arity: :class:`int`
+        :returns: The bitmasks of the minimal sets, in increasing order.
+        :rtype: :py:func:`tuple` of :class:`int`
+        """
+        return MinMax.minimal(MinMax.upset(masks,arity),arity)
+
+    @staticmethod
+    def upset(masks,arity):
+        """
+        Return the sets containing some set of a family, which is the
+        truth table of the corresponding monotone Boolean function.
+
+        :param masks: The bitmasks of the family.
+        :type masks: iterable of :class:`int`
+        :param arity: The number of elements.
+        :type arity: :class:`int`
+        :returns: The integer whose bit m is set if the set with
+            bitmask m contains some set of the family.
+        :rtype: :class:`int`
+        """
+        V = element_sets(arity)
+        up = 0
+        for m in set(masks):
+            u = V[-1]
+            for i in range(arity):
+                if m >> i & 1:
+                    u &= V[i]
+            up |= u
+        return up
+
+    @staticmethod
+    def minimal(up,arity):
+        """
+        Return the minimal sets of an up-set (see :meth:`upset`).
+
+        :param up: The up-set.
+        :type up: :class:`int`
+        :param arity: The number of elements.
+        :type arity: :class:`int`
+        :returns: The bitmasks of the minimal sets, in increasing order.
+        :rtype: :py:func:`tuple` of :class:`int`
+        """
+        V = element_sets(arity)
+        up = int(up)
+        low = up
+        for i in range(arity):
+            # The sets containing i whose set without i is in the up-set
+            low &= ~((up & ~V[i]) << (1 << i))
+        masks = []
+        while low:
+            b = low & -low
+            masks.append(b.bit_length()-1)
+            low ^= b
+        return tuple(masks)
+
     @staticmethod
     def sperner(T):
         """
@@ -227,55 +383,271 @@ class MinMax(Operation):
         :returns: The largest Sperner family contained in t
         :rtype: :class:`set` of :class:`set` of integer
         """
-        i = 0
-        T = list(T)
-        while(i < len(T)):
-            if sum([a <= T[i] for a in T]) >= 2:
-                T.pop(i)
-            else:
-                i += 1
-        return frozenset(T)
+        T = [frozenset(s) for s in T]
+        n = max([max(s) + 1 for s in T if len(s) > 0] + [0])
+        return frozenset(frozenset(MinMax.elements(m,n)) for m in
+                         MinMax.antichain([MinMax.mask(s,n) for s in T],n))
 
     @staticmethod
     def clone(arity,dom=2):
         """ Returns a fixed arity section of the clone generated by min
         and max.
     
-        This function generates the {min,max}-clone recursively, using the 
-        standard technique for enumerating monotone boolean functions.
+        This is the clone of all non-constant monotone Boolean
+        functions, which are enumerated as truth tables (see
+        :func:`monotone_functions`). The MinMax operations are only
+        created when they are requested (see :class:`MinMaxClone`).
+        The clone is stored, so it is only built once for each arity
+        and domain size.
     
         :param arity: The arity of the clone generated.
         :type arity: integer
         :param dom: The domain size.
         :type dom: integer, Optional.
-        :rtype: :class:`Clone`
+        :rtype: :class:`MinMaxClone`
         """
-        
-        # Start with the 0-projection
-        clone = [MinMax(arity,[set([0])],dom)]
-        for i in range(1,arity):
-            N = len(clone)
-            
-            clone.append(MinMax(arity,[set([i])],dom))
-            
-            # x[i] and t
-            for t in clone[0:N]:
-                clone.append(clone[N]*t)
-
-            # x[i] or t
-            for t in clone[0:N]:
-                clone.append(clone[N]+t)
-
-            # For each s,t with s <= t, we add s or (x[i] and t)
-            for j in range(0,N):
-                s = clone[j]
-                for t in clone[j+1:N]:
-                    if s <= t:
-                        clone.append(s + clone[N]*t)
-                    elif t <= s:
-                        clone.append(t + clone[N]*s)
-
-        return Clone(clone)
+        try:
+            return MinMax.clones[arity,dom]
+        except KeyError:
+            clone = MinMaxClone(arity,dom)
+            MinMax.clones[arity,dom] = clone
+            return clone
+
+# The bitsets from element_sets, by arity
+element_set_cache = dict()
+
+def element_sets(arity):
+    """ Return the bitsets of the subsets of range(arity) containing
+    each bit.
+
+    A family of subsets of range(arity) is stored as the integer whose
+    bit m is set if the subset with bitmask m is in the family.
+
+    :param arity: The number of elements.
+    :type arity: :class:`int`
+    :returns: A list V of arity+1 integers, where V[i] is the family of
+        subsets whose bitmask has bit i set, for i < arity, and
+        V[arity] is the family of all subsets.
+    :rtype: :py:func:`list` of :class:`int`
+    """
+    try:
+        return element_set_cache[arity]
+    except KeyError:
+        n = 1 << arity
+        full = (1 << n) - 1
+        V = []
+        for i in range(arity):
+            # Blocks of 2**i zeros followed by 2**i ones, from bit 0
+            block = ((1 << (1 << i)) - 1) << (1 << i)
+            period = 1 << (i+1)
+            pattern = 0
+            for j in range(0,n,period):
+                pattern |= block << j
+            V.append(pattern & full)
+        V.append(full)
+        element_set_cache[arity] = V
+        return V
+
+def monotone_functions(arity):
+    """ Return the truth tables of all monotone Boolean functions of a
+    given arity.
+
+    A truth table is a word with 2**arity bits, whose bit t is the
+    value at the t-th tuple of product(range(2),repeat=arity). A function
+    of arity k is monotone if and only if it is f0 on the tuples with
+    first entry 0 and f1 on the others, for monotone functions f0 <= f1
+    of arity k-1, so the truth tables are built up one argument at a
+    time from the two constants.
+
+    :param arity: The arity.
+    :type arity: integer
+    :returns: The truth tables, in increasing order.
+    :rtype: :class:`numpy.ndarray` of :class:`numpy.uint64`, or of
+        Python integers if arity > 6
+
+    .. note:: There are 7828354 monotone functions of arity 6. The
+        number of arity 7 is too large to enumerate.
+    """
+    dtype = numpy.uint64 if arity <= 6 else object
+    M = numpy.array([0,1],dtype=dtype)
+    for k in range(arity):
+        half = numpy.array(1 << k,dtype=dtype)
+        W = []
+        for f0 in M:
+            # The functions f1 above f0
+            f1 = M[(M & f0) == f0]
+            W.append(f0 | (f1 << half))
+        M = numpy.sort(numpy.concatenate(W))
+    return M
+
+class MinMaxClone(Clone):
+    """ The clone generated by min and max, which is never materialized.
+
+    The operations are stored as the truth tables of the non-constant
+    monotone Boolean functions (see :func:`monotone_functions`). The
+    projections come first, and are followed by the other operations in
+    increasing order of their truth tables. A :class:`MinMax`
+    operation is created from the minimal sets of its truth table when
+    it is requested, and value tables are computed from the truth
+    tables a block at a time.
+
+    Over a larger domain, a min/max operation f satisfies f(x) >= a if
+    and only if f(x >= a) = 1, where x >= a is the Boolean tuple
+    comparing each entry with a, so its value table is the sum of
+    dom-1 lookups in its truth table.
+
+    :param arity: The arity of the clone.
+    :type arity: integer
+    :param dom: The domain size.
+    :type dom: integer, Optional
+    """
+
+    def __init__(self,arity,dom=2):
+        """
+        Create the clone generated by min and max.
+        """
+        self.arity = arity
+        self.dom = dom
+        M = monotone_functions(arity)
+        V = element_sets(arity)
+        proj = numpy.array([V[arity-1-i] for i in range(arity)],
+                           dtype=M.dtype)
+        rest = M[1:-1]
+        self.words = numpy.concatenate([proj,rest[~numpy.in1d(rest,proj)]])
+        self.order = numpy.argsort(self.words,kind='mergesort')
+        self.sorted = self.words[self.order]
+        X = tuple_array(arity,dom)
+        place = radix(arity,2)
+        self.codes = [(X >= a).astype(numpy.int64).dot(place)
+                      for a in range(1,dom)]
+        # The positions of the Boolean tuples in the value tables
+        self.boolean = tuple_array(arity,2).astype(numpy.int64).dot(
+            radix(arity,dom))
+        self.shift = numpy.arange(1 << arity).astype(M.dtype)
+        self.bits = numpy.ones(1 << arity,dtype=M.dtype) << self.shift
+        self.matrix = None
+        self.rows = None
+        self.comp = dict()
+        self.perm = None
+        self.hasse = None
+
+    def __repr__(self):
+        return "MinMaxClone(%d, %d)" % (self.arity,self.dom)
+
+    def __len__(self):
+        """ Return the number of operations in this clone. """
+        return len(self.words)
+
+    def __getitem__(self,i):
+        """ Return the i-th operation in this clone. """
+        f = MinMax(self.arity,[],self.dom)
+        f.masks = MinMax.minimal(self.words[i],self.arity)
+        return f
+
+    def __contains__(self,f):
+        """ Test if an operation is in this clone. """
+        return (f.arity == self.arity and f.dom == self.dom
+                and self.table_indices(f.value_table()) >= 0)
+
+    def get_index(self,f):
+        """ Return the index of a particular Operation in this clone. """
+        if f.arity != self.arity or f.dom != self.dom:
+            raise KeyError(f)
+        i = int(self.table_indices(f.value_table()))
+        if i < 0:
+            raise KeyError(f)
+        return i
+
+    def truth_values(self,W):
+        """ Return the value tables of the operations with truth tables
+        W. """
+        B = ((W[:,None] >> self.shift) & 1).astype(table_dtype(self.dom))
+        T = numpy.zeros((len(W),self.dom**self.arity),
+                        dtype=table_dtype(self.dom))
+        for c in self.codes:
+            T += B[:,c]
+        return T
+
+    def value_rows(self,lo,hi):
+        """ Return the value tables of the operations lo,...,hi-1,
+        computed from their truth tables. """
+        return self.truth_values(self.words[lo:hi])
+
+    def value_matrix(self):
+        """ Return the value tables of all operations.
+
+        .. warning:: This materializes the whole clone.
+        """
+        if self.matrix is None:
+            self.matrix = self.value_rows(0,len(self))
+        return self.matrix
+
+    def word_indices(self,W):
+        """ Return the indices of the operations with truth tables W,
+        or -1 for words which are not in the clone. """
+        W = numpy.asarray(W,dtype=self.words.dtype)
+        pos = numpy.searchsorted(self.sorted,W)
+        pos[pos == len(self)] = 0
+        return numpy.where(self.sorted[pos] == W,self.order[pos],-1)
+
+    def meet(self,I,J):
+        """ Return the indices of the meets (minimums) of the operations
+        with indices I and J, or -1 where the meet is constant. """
+        return self.word_indices(self.words[I] & self.words[J])
+
+    def join(self,I,J):
+        """ Return the indices of the joins (maximums) of the operations
+        with indices I and J, or -1 where the join is constant. """
+        return self.word_indices(self.words[I] | self.words[J])
+
+    def covers(self):
+        """ Return the covering relation of the lattice of operations in
+        this clone.
+
+        The truth table of an operation covering another has exactly
+        one more point, which is a maximal point outside the up-set of
+        the smaller operation. So the diagram is found with one pass
+        over the words for each point.
+
+        :returns: an integer array of shape (E,2), whose rows (i,j) are
+            the pairs such that self[j] covers self[i], in increasing
+            order.
+        :rtype: :class:`numpy.ndarray`
+
+        .. note:: The result is computed on the first call and stored.
+        """
+        if self.hasse is None:
+            W = self.words
+            one = numpy.array(1,dtype=W.dtype)
+            E = []
+            for p in range(1 << self.arity):
+                # Can p be added to the up-set?
+                ok = ((W >> self.shift[p]) & one) == 0
+                for i in range(self.arity):
+                    if not p >> i & 1:
+                        ok &= ((W >> self.shift[p | 1 << i]) & one) == 1
+                I = numpy.flatnonzero(ok)
+                J = self.word_indices(W[I] | self.bits[p])
+                E.append(numpy.column_stack([I,J])[J >= 0])
+            E = numpy.concatenate(E)
+            self.hasse = E[numpy.lexsort((E[:,1],E[:,0]))]
+        return self.hasse
+
+    def table_indices(self,G):
+        """ Return the indices of the operations with given value
+        tables, found from their truth tables. """
+        G = numpy.asarray(G)
+        flat = G.reshape(-1,G.shape[-1])
+        W = (flat[:,self.boolean] != 0).astype(self.words.dtype).dot(
+            self.bits)
+        index = self.word_indices(W)
+        # Check the rest of each value table, which is only determined
+        # by the truth table for min/max operations
+        found = numpy.flatnonzero(index >= 0)
+        if len(found) > 0 and (self.dom > 2 or (flat > 1).any()):
+            same = (self.truth_values(W[found]) == flat[found]).all(axis=1)
+            index[found[~same]] = -1
+        return index.reshape(G.shape[:-1])
 
 class Submodular(WeightedOperation):
     """
@@ -304,39 +676,147 @@ class Submodular(WeightedOperation):
         For the weighted polymorphisms <min,max>, we only need to
         consider translations by pairs of operations whose lub and glb
         are immediately above and below them respectively (in the
-        lattice of MinMax operations).
-
-        .. todo: Need to allow comparison of Operations if this is to work for
-        larger clones
+        lattice of MinMax operations). These are the pairs of distinct
+        operations covering the same operation, which are read from
+        the covering relation of the min/max clone (see
+        :meth:`MinMaxClone.covers`), with joins found from truth
+        tables.
+
+        .. note:: The rows are in the order of the positions of the
+            pair in the clone. Operations in the clone which are not
+            min/max operations are ignored.
         """
 
+        C = MinMax.clone(arity,self.dom)
         if clone is None:
-            clone = MinMax.clone(arity,self.dom)
-                        
+            clone = C
         N = len(clone)
+        if clone is C:
+            pos = numpy.arange(N)
+        else:
+            # The position in clone of each operation in C
+            index = C.table_indices(clone.value_matrix())
+            pos = -numpy.ones(len(C),dtype=numpy.intp)
+            pos[index[index >= 0]] = numpy.flatnonzero(index >= 0)
+
+        E = C.covers()
+        start = numpy.searchsorted(E[:,0],numpy.arange(len(C)+1))
+        rows = []
+        for m in numpy.flatnonzero(numpy.diff(start) >= 2):
+            up = E[start[m]:start[m+1],1]
+            (F,G) = [numpy.array(x,dtype=numpy.intp) for x in
+                     zip(*it.combinations(up.tolist(),2))]
+            keep = (pos[F] >= 0) & (pos[G] >= 0)
+            (F,G) = (F[keep],G[keep])
+            J = C.join(F,G)
+            for (f,g,j) in zip(F.tolist(),G.tolist(),J.tolist()):
+                if pos[m] < 0 or pos[j] < 0:
+                    raise KeyError(C[m] if pos[m] < 0 else C[j])
+                (a,b) = sorted((pos[f],pos[g]))
+                rows.append((a,b,pos[m],pos[j]))
+        rows.sort()
         A = []
-        index = dict()
-        for i in range(N):
-            index[clone[i]] = i
-                
-        for i in range(N):
-            for j in range(i+1,N):
-                f = clone[i]
-                g = clone[j]
-                    
-                if (not f < g
-                    and not g < f
-                    and (f*g in f.below() or g in (f+g).below())
-                    and (f*g in g.below() or f in (f+g).below())
-                    ):
-                    row = [0 for _ in range(N)]
-                    row[index[f]] = -1
-                    row[index[g]] = -1
-                    row[index[f+g]] = 1
-                    row[index[f*g]] = 1
-                    A.append(row)
+        for (a,b,m,j) in rows:
+            row = [0 for _ in range(N)]
+            row[a] = -1
+            row[b] = -1
+            row[j] = 1
+            row[m] = 1
+            A.append(row)
         return A
 
+    def improves(self,cf,smallest=True):
+        """
+        Test if a cost function is submodular.
+
+        On a product of chains, a cost function c is submodular if and
+        only if c(x) + c(x+e_i+e_j) <= c(x+e_i) + c(x+e_j) for every
+        tuple x and pair of coordinates i < j with x[i],x[j] < dom-1.
+        For each pair, these inequalities are checked for all x at
+        once, on shifted slices of the cost table (see
+        :meth:`CostFunction.cost_table`), so the test takes time
+        O(dom**r r**2) instead of enumerating tableaux.
+
+        :param cf: The cost function we are checking.
+        :type cf: :class:`CostFunction`
+        :param smallest: Accepted for compatibility with
+            :meth:`WeightedOperation.improves`. The certificate is
+            always the smallest violated local inequality, in the order
+            of imp_ineq, which is often the smallest violated
+            inequality.
+        :type smallest: boolean, optional
+        :returns: True if cf is submodular, and (False,e) otherwise,
+            where e is a violated inequality with 1 at x and
+            x+e_i+e_j and -1 at x+e_i and x+e_j.
+        :rtype: boolean, or (boolean, :py:func:`list` of integer)
+        """
+        return self.improves_many([cf])[0]
+
+    def improves_many(self,cost_functions,workers=None,block=1 << 22):
+        """
+        Test if each of a list of cost functions is submodular, as in
+        :meth:`improves`.
+
+        :param cost_functions: The cost functions.
+        :type cost_functions: :py:func:`list` of :class:`CostFunction`
+        :param workers: The number of processes the cost functions are
+            divided between.
+        :type workers: integer, optional
+        :param block: The largest number of costs compared at once.
+        :type block: integer, optional
+        :returns: The answer of :meth:`improves` for each cost function,
+            in the same order.
+        :rtype: :py:func:`list`
+
+        .. note:: The cost tables of the cost functions of each arity
+            are the columns of a matrix, so each local inequality is
+            checked for a block of cost functions at once.
+        """
+        if workers is not None and workers > 1 and len(cost_functions) > 1:
+            n = (len(cost_functions) + workers - 1) // workers
+            shards = [cost_functions[i:i+n]
+                      for i in range(0,len(cost_functions),n)]
+            answers = parallel.pool_map(wpolyanna.wop.improves_task,shards,
+                                        workers,{'wop': self})
+            return [a for answer in answers for a in answer]
+
+        d = self.dom
+        result = [True for _ in cost_functions]
+        for r in set(cf.arity for cf in cost_functions):
+            index = [i for i in range(len(cost_functions))
+                     if cost_functions[i].arity == r]
+            N = d**r
+            place = radix(r,d)
+            # The tuples x with x[i] < dom-1, for each i
+            inner = [(numpy.arange(N) // place[i]) % d < d-1
+                     for i in range(r)]
+            k = max(1,block // N)
+            for lo in range(0,len(index),k):
+                C = numpy.column_stack([cost_functions[i].cost_table()
+                                        for i in index[lo:lo+k]])
+                # The smallest violated row has the largest x, and then
+                # the smallest steps b < a
+                best = [None for _ in range(C.shape[1])]
+                for (i,j) in it.combinations(range(r),2):
+                    (a,b) = (place[i],place[j])
+                    L = N - a - b
+                    V = C[:L] + C[a+b:] > C[a:a+L] + C[b:b+L]
+                    V &= (inner[i] & inner[j])[:L,None]
+                    last = L - 1 - V[::-1].argmax(axis=0)
+                    for c in numpy.flatnonzero(V.any(axis=0)):
+                        key = (-last[c],b,a)
+                        if best[c] is None or key < best[c]:
+                            best[c] = key
+                for c in range(C.shape[1]):
+                    if best[c] is not None:
+                        (x,b,a) = best[c]
+                        x = -x
+                        e = [0 for _ in range(N)]
+                        e[x] = e[x+a+b] = 1
+                        e[x+a] = e[x+b] = -1
+                        result[index[lo+c]] = (False,e)
+        return result
+
     def in_wclone(self,other,clone=None):
         """
         Tests if another weighted polymorphism is in the weighted clone.
@@ -354,3 +834,24 @@ class Submodular(WeightedOperation):
         if clone is None:
             clone = MinMax.clone(other.arity,self.dom)
         return WeightedOperation.in_wclone(self,other,clone)
+
+    def in_wclone_many(self,others,clone=None,workers=None):
+        """
+        Tests if each of a list of weighted polymorphisms is in the
+        weighted clone.
+
+        This method is overloaded so that we use the more efficient
+        procedure for generating the min/max clone when no clone is
+        passed as input.
+
+        :param others: The weighted operations we are testing.
+        :type others: :py:func:`list` of :class:`WeightedOperation`
+        :param clone: The supporting clone.
+        :type clone: :class:`Clone`
+        :param workers: The number of processes.
+        :type workers: integer
+        """
+
+        if clone is None and len(others) > 0:
+            clone = MinMax.clone(others[0].arity,self.dom)
+        return WeightedOperation.in_wclone_many(self,others,clone,workers)
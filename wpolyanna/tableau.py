@@ -0,0 +1,133 @@
+# Functions shared by the methods which enumerate tableaux, i.e. lists
+# of m tuples of length r over the domain, and apply operations to
+# their columns. A tableau is stored as the indices of its tuples in
+# lexicographic order, so a block of B tableaux is an integer array of
+# shape (B,m).
+import itertools as it
+
+import numpy
+
+from wpolyanna.util import radix, tuple_array, index_tuples
+
+def combinations(n,m,block=1 << 14):
+    """ Generate the tableaux of m tuples in non-decreasing order.
+
+    :param n: the number of tuples
+    :param m: the number of rows of each tableau
+    :param block: the number of tableaux in each block
+    :returns: an iterator over arrays of shape (B,m), in the order of
+        :func:`itertools.combinations_with_replacement`
+    """
+    if m == 0:
+        yield numpy.zeros((1,0),dtype=numpy.intp)
+        return
+    C = it.combinations_with_replacement(range(n),m)
+    while True:
+        X = numpy.fromiter(it.chain.from_iterable(it.islice(C,block)),
+                           dtype=numpy.intp)
+        if len(X) == 0:
+            return
+        yield X.reshape(-1,m)
+
+def split_combinations(S,T,k,m,block=1 << 14):
+    """ Generate the tableaux of m tuples in non-decreasing order with k
+    tuples taken from S and the others from T.
+
+    :param S: an array of tuple indices
+    :param T: an array of tuple indices, disjoint from S
+    :param k: the number of tuples taken from S
+    :param m: the number of rows of each tableau
+    :param block: the number of tableaux in each block, at most
+    :returns: an iterator over arrays of shape (B,m). Each tableau is
+        generated once, and the blocks are produced from the
+        combinations of S and of T without enumerating the other
+        tableaux.
+    """
+    S = numpy.asarray(S,dtype=numpy.intp)
+    T = numpy.asarray(T,dtype=numpy.intp)
+    for A in combinations(len(S),k,block):
+        for B in combinations(len(T),m-k,max(1,block // len(A))):
+            (I,J) = [x.ravel() for x in numpy.indices((len(A),len(B)))]
+            X = numpy.hstack([S[A[I]],T[B[J]]])
+            X.sort(axis=1)
+            yield X
+
+def products(S,block=1 << 14):
+    """ Generate the tableaux whose i-th tuple is taken from S[i].
+
+    :param S: a list of m arrays of tuple indices
+    :param block: the number of tableaux in each block
+    :returns: an iterator over arrays of shape (B,m), in the order of
+        :func:`itertools.product`
+    """
+    S = [numpy.asarray(s,dtype=numpy.intp) for s in S]
+    for T in index_tuples([(0,len(s)) for s in S],block=block):
+        for j in range(len(S)):
+            T[:,j] = S[j][T[:,j]]
+        yield T
+
+def apply_tables(tables,X,r,dom):
+    """ Apply operations to the columns of a block of tableaux.
+
+    :param tables: the value tables of K operations of arity m, with
+        shape (K,dom**m)
+    :param X: a block of B tableaux, with shape (B,m)
+    :param r: the length of the tuples
+    :param dom: the domain size
+    :returns: an array Y of shape (K,B), where Y[k,b] is the index of
+        the tuple obtained by applying the k-th operation to the columns
+        of the b-th tableau.
+    :rtype: :class:`numpy.ndarray`
+    """
+    m = X.shape[1]
+    # The index of every column of every tableau, with shape (B,r)
+    D = tuple_array(r,dom)[X]
+    c = numpy.zeros((len(X),r),dtype=numpy.intp)
+    for i in range(m):
+        c *= dom
+        c += D[:,i,:]
+    # Look up all operations at once, with shape (K,B,r)
+    V = numpy.asarray(tables)[:,c]
+    return V.astype(numpy.intp).dot(radix(r,dom))
+
+def weighted_rows(tables,weights,X,r,dom):
+    """ Return the inequalities imposed by a weighted operation on a
+    block of tableaux.
+
+    :param tables: the value tables of the supporting operations
+    :param weights: their weights
+    :param X: a block of B tableaux
+    :returns: an array of shape (B,dom**r) whose b-th row holds the
+        total weight assigned to each tuple by the b-th tableau
+    """
+    weights = numpy.asarray(weights)
+    Y = apply_tables(tables,X,r,dom)
+    A = numpy.zeros((len(X),dom**r),dtype=weights.dtype)
+    numpy.add.at(A,(numpy.arange(len(X))[:,None],Y.T),weights)
+    return A
+
+def cost_rows(clone,costs,X,r,dom,block=1 << 20):
+    """ Return the costs of applying every operation in a clone to a
+    block of tableaux.
+
+    :param clone: the clone, which is read a block of value tables at a
+        time
+    :param costs: the costs of the tuples, as an array, or a function
+        returning the costs of an array of tuple indices (see
+        :meth:`CostFunction.tuple_costs`)
+    :param X: a block of B tableaux
+    :returns: an array of shape (B,N) whose b-th row holds the cost of
+        the result of applying each operation to the b-th tableau
+    """
+    if not callable(costs):
+        costs = costs.__getitem__
+    N = len(clone)
+    A = None
+    step = max(1,block // max(1,len(X)*r))
+    for lo in range(0,N,step):
+        Y = apply_tables(clone.value_rows(lo,lo+step),X,r,dom)
+        C = costs(Y).T
+        if A is None:
+            A = numpy.empty((len(X),N),dtype=C.dtype)
+        A[:,lo:lo+len(Y)] = C
+    return A
@@ -5,3 +5,7 @@ from wpolyanna.test.test_wop import *
 from wpolyanna.test.test_cost_function import *
 from wpolyanna.test.test_submodular import *
 from wpolyanna.test.test_sharpternop import *
+from wpolyanna.test.test_tableau import *
+from wpolyanna.test.test_inequality import *
+from wpolyanna.test.test_parallel import *
+from wpolyanna.test.test_cache import *
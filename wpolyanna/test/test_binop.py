@@ -1,6 +1,7 @@
 import unittest
+from itertools import product
 
-from wpolyanna.op import Projection
+from wpolyanna.op import ExplicitOperation, Projection
 from wpolyanna.binop import BinaryOperation
 from wpolyanna.exception import DomainError
 
@@ -39,6 +40,10 @@ class TestBinaryOperation(unittest.TestCase):
         self.assertEqual(self.f,self.fcopy)
         self.assertNotEqual(self.f,self.min)
         self.assertEqual(self.proj[0],Projection(2,2,0))
+        self.assertEqual(hash(self.proj[0]),hash(Projection(2,2,0)))
+        self.assertEqual(hash(self.min),
+                         hash(ExplicitOperation(2,2,{(0,0):0,(0,1):0,
+                                                     (1,0):0,(1,1):1})))
 
     def test_get(self):
         self.assertEqual(self.f[0,0],1)
@@ -53,6 +58,11 @@ class TestBinaryOperation(unittest.TestCase):
                          BinaryOperation(2,{(0,0):1,(1,1):0,(0,1):1},
                                          True, False))
         self.assertEqual(self.proj[1].compose([self.f,self.min]),self.min)
+        p = [Projection(3,2,i) for i in range(3)]
+        self.assertEqual(self.min.compose([p[0],p[2]]),
+                         ExplicitOperation(3,2,dict((x,min(x[0],x[2])) for x
+                                                    in product([0,1],
+                                                               repeat=3))))
 
     def test_is_projection(self):
         self.assertTrue(self.proj[0].is_projection())
@@ -0,0 +1,90 @@
+import unittest
+import gc
+import sys
+import weakref
+
+from wpolyanna import cache
+from wpolyanna.op import ExplicitOperation, Projection
+from wpolyanna.binop import BinaryOperation
+from wpolyanna.submodular import MinMax
+
+class TestCompositionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.min2 = ExplicitOperation(2,2,{(0,0):0,(0,1):0,(1,0):0,(1,1):1})
+        self.max2 = ExplicitOperation(2,2,{(0,0):0,(0,1):1,(1,0):1,(1,1):1})
+        self.proj2 = [Projection(2,2,0),Projection(2,2,1)]
+        cache.disable()
+
+    def tearDown(self):
+        cache.disable()
+
+    def test_disabled(self):
+        self.assertEqual(cache.stats(),None)
+        f = self.min2.compose([self.max2,self.proj2[0]])
+        self.assertFalse(f is self.min2.compose([self.max2,self.proj2[0]]))
+
+    def test_hits(self):
+        cache.enable()
+        f = self.min2.compose([self.max2,self.proj2[0]])
+        g = self.min2.compose([self.max2,self.proj2[1]])
+        # The composition, including its table of tuples, and the
+        # operands of each entry
+        size = cache.footprint(f) + cache.footprint(g) + 2*3*4
+        self.assertTrue(cache.footprint(g) > sys.getsizeof(g.f) + 4)
+        self.assertTrue(f is self.min2.compose([self.max2,self.proj2[0]]))
+        self.assertEqual(f,self.proj2[0])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'],stats['misses'],stats['entries']),
+                         (1,2,2))
+        self.assertEqual(stats['nbytes'],size)
+
+    def test_references(self):
+        cache.enable()
+        f = ExplicitOperation(2,2,{(0,0):1,(0,1):0,(1,0):0,(1,1):0})
+        ref = weakref.ref(f)
+        self.min2.compose([f,self.proj2[0]])
+        del f
+        gc.collect()
+        self.assertTrue(ref() is None)
+        self.assertEqual(len(cache.active),1)
+
+    def test_classes(self):
+        cache.enable()
+        f = MinMax(2,[[0,1]])
+        g = MinMax(2,[[0],[1]])
+        self.assertEqual(f.compose([g,g]).__class__,MinMax)
+        self.assertEqual(f.compose([self.max2,self.max2]).__class__,
+                         ExplicitOperation)
+        self.assertEqual(cache.stats()['misses'],2)
+        h = BinaryOperation(2,{(0,0):0,(0,1):1,(1,0):1,(1,1):1})
+        self.assertEqual(h.compose([g,g]).__class__,BinaryOperation)
+
+    def test_eviction(self):
+        cache.enable()
+        self.min2.compose([self.max2,self.proj2[0]])
+        size = cache.stats()['nbytes']
+        cache.disable()
+        cache.enable(2*size)
+        F = [[self.max2,self.proj2[0]],[self.max2,self.proj2[1]],
+             [self.proj2[0],self.proj2[1]]]
+        for G in F:
+            self.min2.compose(G)
+        self.assertEqual(cache.stats()['evictions'],1)
+        self.min2.compose(F[2])
+        self.min2.compose(F[0])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'],stats['evictions']),(1,2))
+        self.assertEqual(len(cache.active),2)
+        self.assertTrue(self.min2.compose(F[2]) is not None)
+        self.assertEqual(cache.stats()['hits'],2)
+
+def suite():
+
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestCompositionCache))
+    return suite
+
+if __name__ == '__main__':
+
+    unittest.main()
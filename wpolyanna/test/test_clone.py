@@ -1,7 +1,7 @@
 import unittest
 
-from wpolyanna.op import ExplicitOperation, Projection
-from wpolyanna.clone import Clone
+from wpolyanna.op import ExplicitOperation, TableOperation, Projection
+from wpolyanna.clone import Clone, TableClone, AllOperations
 
 class TestClone(unittest.TestCase):
 
@@ -64,15 +64,132 @@ class TestClone(unittest.TestCase):
     def test_generate(self):
         clone = Clone.generate([self.f],2)
         self.assertEqual(clone,self.clone)
+        self.assertEqual(clone[0],Projection(2,5,0))
+        self.assertEqual(clone[1],Projection(2,5,1))
+
+    def test_generate2(self):
+        clone = Clone.generate2([self.f],2)
+        self.assertEqual(clone,self.clone)
+
+    def test_generate_order(self):
+        # The operations are in the order they were found before the
+        # closure was computed semi-naively, read as binary numbers
+        nand = ExplicitOperation(2,2,{(0,0):1,(0,1):1,(1,0):1,(1,1):0})
+        code = lambda f: int("".join(map(str,f.value_table().tolist())),2)
+        self.assertEqual([code(f) for f in Clone.generate([nand],2)],
+                         [3,5,14,13,11,12,10,6,15,9,7,1,2,4,8])
+        self.assertEqual([code(f) for f in Clone.generate2([nand],2)],
+                         [3,5,12,14,10,1,15,11,13,0,4,2,7,8])
+        self.assertEqual([code(f) for f in Clone.generate([nand],3)][:16],
+                         [15,51,85,252,250,238,243,245,241,207,205,221,171,
+                          175,187,7])
 
     def test_repr(self):
         self.assertEqual(self.clone,eval(repr(self.clone)))
+
+    def test_contains(self):
+        self.assertTrue(self.g in self.clone)
+        self.assertFalse(ExplicitOperation(2,5,dict(((i,j),0) for i in range(5)
+                                                    for j in range(5)))
+                         in self.clone)
+
+    def test_permutation_table(self):
+        (S,P) = self.clone.permutation_table()
+        self.assertEqual(S,[(0,1),(1,0)])
+        self.assertEqual(P.tolist(),[[0,1,2,3,4],[1,0,2,4,3]])
+        self.assertEqual(Clone(self.clone[0:4]).permutation_table(),None)
+        (S,P) = Clone.all_operations(2,2).permutation_table()
+        for i in range(16):
+            f = Clone.all_operations(2,2)[i]
+            g = f.compose([Projection(2,2,1),Projection(2,2,0)])
+            self.assertEqual(Clone.all_operations(2,2)[P[1][i]],g)
+
+    def test_orbits(self):
+        (reps,orbit) = self.clone.orbits()
+        self.assertEqual(reps,[0,2,3])
+        self.assertEqual(orbit.tolist(),[0,0,1,2,2])
+        M = [[1,2,3,4,5],[0,0,1,0,-1]]
+        self.assertEqual(self.clone.orbit_sums(M).tolist(),
+                         [[3,3,9],[0,1,-1]])
+        (reps,orbit) = Clone(self.clone[0:4]).orbits()
+        self.assertEqual(reps,[0,1,2,3])
+
+    def test_composition_table(self):
+        R = self.clone.composition_table(self.f)
+        self.assertEqual(R.shape,(5,5))
+        for i in range(5):
+            for j in range(5):
+                h = self.f.compose([self.clone[i],self.clone[j]])
+                if h in self.clone:
+                    self.assertEqual(R[i,j],self.clone.get_index(h))
+                else:
+                    self.assertEqual(R[i,j],-1)
+        self.assertEqual(self.clone.compose_index(self.f,(0,1)),2)
+        self.assertEqual(self.clone.compose_index(self.g,(1,0)),4)
+        sub = Clone(self.clone[0:3])
+        self.assertEqual(sub.composition_table(self.f)[2,0],-1)
+        self.assertRaises(KeyError,sub.compose_index,self.f,(2,0))
+
+    def test_table_clone(self):
+        clone = TableClone.from_clone(self.clone)
+        self.assertEqual(len(clone),5)
+        self.assertEqual(clone,self.clone)
+        self.assertEqual(clone[3],self.g)
+        self.assertEqual(clone.get_index(self.h),4)
+        self.assertEqual(clone.get_index(Projection(2,5,1)),1)
+        self.assertEqual(clone.composition_table(self.f).tolist(),
+                         self.clone.composition_table(self.f).tolist())
+        self.assertEqual(clone,eval(repr(clone)))
         
+class TestAllOperations(unittest.TestCase):
+
+    def setUp(self):
+        self.clone = Clone.all_operations(2,3)
+
+    def test_len(self):
+        self.assertEqual(len(self.clone),3**9)
+        self.assertEqual(len(Clone.all_operations(1,2)),4)
+
+    def test_get(self):
+        self.assertEqual(self.clone[0],Projection(2,3,0))
+        self.assertEqual(self.clone[1],Projection(2,3,1))
+        self.assertEqual(self.clone[2],TableOperation(2,3,[0]*9))
+        self.assertEqual(self.clone[-1],TableOperation(2,3,[2]*9))
+        # The first projection is skipped
+        self.assertEqual(self.clone[378],TableOperation(2,3,[0,0,0,1,1,1,
+                                                             2,2,1]))
+        self.assertEqual(self.clone[379],TableOperation(2,3,[0,0,0,1,1,2,
+                                                             0,0,0]))
+        self.assertRaises(IndexError,self.clone.__getitem__,3**9)
+
+    def test_index(self):
+        for i in [0,1,2,100,3**6+1,3**8+3**7,3**9-1]:
+            self.assertEqual(self.clone.get_index(self.clone[i]),i)
+        f = ExplicitOperation(2,3,dict(((a,b),(a+b) % 3) for a in range(3)
+                                       for b in range(3)))
+        self.assertEqual(self.clone[self.clone.get_index(f)],f)
+        self.assertTrue(f in self.clone)
+
+    def test_value_rows(self):
+        M = self.clone.value_rows(0,6)
+        self.assertEqual([tuple(m) for m in M],
+                         [self.clone[i].value_tuple() for i in range(6)])
+        self.assertEqual(self.clone.table_indices(M).tolist(),range(6))
+
+    def test_eq(self):
+        self.assertEqual(Clone.all_operations(1,2),
+                         Clone([Projection(1,2,0),
+                                TableOperation(1,2,[0,0]),
+                                TableOperation(1,2,[1,0]),
+                                TableOperation(1,2,[1,1])]))
+        self.assertEqual(self.clone,AllOperations(2,3))
+
 def suite():
 
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(TestOperation))
     suite.addTest(unittest.makeSuite(TestClone))
+    suite.addTest(unittest.makeSuite(TestAllOperations))
     return suite
 
 if __name__ == '__main__':
@@ -1,10 +1,16 @@
 import unittest
+import pulp
+from fractions import Fraction
+import itertools as it
+import numpy
 
 from wpolyanna import CostFunction
+from wpolyanna import SparseCostFunction
 from wpolyanna import Projection
 from wpolyanna import ExplicitOperation
 from wpolyanna import WeightedOperation
 from wpolyanna import wpol
+from wpolyanna import Clone
 from wpolyanna.exception import *
 
 class TestCostFunction(unittest.TestCase):
@@ -47,14 +53,103 @@ class TestCostFunction(unittest.TestCase):
         self.assertEqual(self.unary[0].cost_tuple(),(1,0))
         self.assertEqual(self.unary[1].cost_tuple(),(0,1))
 
+    def test_cost_table(self):
+        self.assertEqual(self.softimp.cost_table().tolist(),[0,0,1,0])
+
+        class Parity(CostFunction):
+            def __init__(self):
+                self.arity = 3
+                self.dom = 2
+                self.calls = 0
+            def __getitem__(self,x):
+                self.calls += 1
+                return sum(x) % 2
+        cf = Parity()
+        self.assertEqual(cf.cost_tuple(),(0,1,1,0,1,0,0,1))
+        self.assertEqual(cf.cost_table().tolist(),list(cf.cost_tuple()))
+        self.assertEqual(hash(cf),9)
+        self.assertEqual(cf.calls,8)
+
+    def test_sparse(self):
+        cf = SparseCostFunction(2,2,{(1,0):1})
+        self.assertEqual(cf[(1,0)],1)
+        self.assertEqual(cf[(1,1)],0)
+        self.assertRaises(DomainError,cf.__getitem__,(0,2))
+        self.assertEqual(cf,self.softimp)
+        self.assertEqual(hash(cf),hash(self.softimp))
+        self.assertEqual(cf,eval(repr(cf)))
+        self.assertEqual(cf.cost_support().tolist(),[2])
+        self.assertEqual(cf.wpol_ineq(2),self.softimp.wpol_ineq(2))
+        cf = SparseCostFunction(2,2,{(0,0):0,(1,1):2},1)
+        self.assertEqual(cf.cost_tuple(),(0,1,1,2))
+        self.assertEqual(cf.cost_support().tolist(),[1,2,3])
+        self.assertRaises(DomainError,SparseCostFunction,2,2,{(0,2):1})
+
+    def test_sparse_table(self):
+        cf = SparseCostFunction(3,2,{(1,0,1):2,(0,0,1):0})
+        self.assertEqual(cf.tuple_costs(numpy.array([[5,1],[7,0]])).tolist(),
+                         [[2,0],[0,0]])
+        # The tableaux only read the stored costs
+        dense = CostFunction(3,2,dict(zip(it.product(range(2),repeat=3),
+                                          cf.cost_tuple())))
+        cf = SparseCostFunction(3,2,cf.costs)
+        self.assertEqual(cf.wpol_ineq(2),dense.wpol_ineq(2))
+        self.assertTrue(cf.table is None)
+        # The table is built once
+        T = cf.cost_table()
+        self.assertTrue(cf.cost_table() is T)
+        self.assertEqual(T.tolist(),[0,0,0,0,0,2,0,0])
+
     def test_wop_ineq(self):
         self.assertEqual(self.unary[0].wop_ineq(1),
                          [[0,0,-1,0,0],[0,0,0,-1,0],[0,0,0,0,-1],
                           [0,1,1,1,1],[0,-1,-1,-1,-1]])
+        clone = Clone.all_operations(2,2)
+        B = list(self.softimp.wop_rows(2,clone,block=40))
+        self.assertEqual([len(b) for b in B],[2]*8)
+        self.assertEqual(sum([b.tolist() for b in B],[]),
+                         self.softimp.wop_ineq(2,clone))
         
     def test_wpol_ineq(self):
         self.assertEqual(self.unary[0].wpol_ineq(1),[[0,0,1,1,0],[0,1,1,0,0]])
         self.assertEqual(self.unary[1].wpol_ineq(1),[[0,0,0,1,1],[0,1,0,0,1]])
+        # Tableaux are enumerated up to row permutations when the clone
+        # is closed under permuting arguments
+        for k in [2,3]:
+            clone = Clone.all_operations(k,2)
+            plain = Clone(list(clone))
+            plain.perm = (None,None)
+            self.assertEqual(self.softimp.wpol_ineq(k,clone),
+                             self.softimp.wpol_ineq(k,plain))
+
+    def test_wpol_rows(self):
+        # The sorted tableaux are built from the zero and non-zero
+        # tuples, and give the same rows as all tableaux
+        rows = lambda cf,k,clone: set(tuple(row) for B in cf.wpol_rows(k,clone)
+                                      for row in B.tolist())
+        cases = [(2,SparseCostFunction(2,3,{(2,0):1})),
+                 (2,SparseCostFunction(2,3,{(2,0):-1,(0,1):2})),
+                 (2,SparseCostFunction(1,3,{(1,):-1})),
+                 (3,SparseCostFunction(2,2,{(1,0):-1})),
+                 (3,self.softimp)]
+        for (k,cf) in cases:
+            clone = Clone.all_operations(k,cf.dom)
+            plain = Clone(list(clone))
+            plain.perm = (None,None)
+            self.assertEqual(rows(cf,k,clone),rows(cf,k,plain))
+
+    def test_fractions(self):
+        # Rational costs give arrays of objects
+        third = Fraction(1,3)
+        cf = CostFunction(2,2,{(0,0):0,(0,1):0,(1,0):third,(1,1):0})
+        A = cf.wpol_ineq(2)
+        self.assertEqual(A,[[x*third for x in row]
+                            for row in self.softimp.wpol_ineq(2)])
+        clone = Clone.all_operations(2,2)
+        plain = Clone(list(clone))
+        plain.perm = (None,None)
+        self.assertEqual(cf.wpol_ineq(2,plain),A)
+        self.assertEqual(len(cf.wpol(2)),len(self.softimp.wpol(2)))
 
     def test_wpol(self):
         self.assertEqual(self.unary[0].wpol(1),[WeightedOperation(1, 2,
@@ -64,10 +159,43 @@ class TestCostFunction(unittest.TestCase):
         self.assertEqual(wpol(self.unary,1),[])
         self.assertEqual(wpol(self.unary,2),[self.sm])
 
+    def test_wpol_workers(self):
+        clone = Clone.all_operations(3,2)
+        Gamma = self.unary + [self.softimp]
+        self.assertEqual(wpol(Gamma,3,clone,workers=3),wpol(Gamma,3,clone))
+        self.assertEqual(wpol(self.unary,2,workers=2),[self.sm])
+
+    def test_wpol_symmetric(self):
+        self.assertEqual(self.unary[0].wpol(1,symmetric=True),
+                         self.unary[0].wpol(1))
+        clone = Clone.all_operations(2,2)
+        W = wpol(self.unary,2,clone,symmetric=True)
+        self.assertEqual([w.expand_orbits(clone) for w in W],[self.sm])
+        clone = Clone.all_operations(3,2)
+        W = wpol(self.unary + [self.softimp],3,clone,symmetric=True)
+        self.assertTrue(len(W) > 0)
+        for w in W:
+            w = w.expand_orbits(clone)
+            self.assertEqual(w.get_weight(clone[0]),w.get_weight(clone[1]))
+            for cf in self.unary + [self.softimp]:
+                self.assertTrue(w.is_wpol(cf))
+
     def test_wpol_separate(self):
         self.assertFalse(self.softimp.wpol_separate(self.unary,1))
         self.assertFalse(self.softimp.wpol_separate(self.unary,2))
         self.assertTrue(self.softimp.wpol_separate(self.unary,3))
+        self.assertEqual(self.softimp.wpol_separate(self.unary,3,workers=2),
+                         self.softimp.wpol_separate(self.unary,3))
+
+        class Counting(pulp.LpSolverDefault.__class__):
+            calls = 0
+            def actualSolve(self,lp,**kwargs):
+                Counting.calls += 1
+                return pulp.LpSolverDefault.actualSolve(lp,**kwargs)
+        self.assertEqual(self.softimp.wpol_separate(self.unary,3,
+                                                    solver=Counting()),
+                         self.softimp.wpol_separate(self.unary,3))
+        self.assertTrue(Counting.calls > 0)
         
 def suite():
 
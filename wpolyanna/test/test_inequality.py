@@ -0,0 +1,99 @@
+import unittest
+import pickle
+
+import cdd
+import pulp
+import numpy
+
+from wpolyanna import InequalityMatrix
+from wpolyanna.inequality import SeparationLP, MembershipLP
+
+class TestInequalityMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.A = InequalityMatrix([[0,1,-1],[0,-1,1],[0,1,-1]])
+
+    def test_add(self):
+        self.assertEqual(len(self.A),2)
+        self.assertEqual(self.A.add([0,1,-1]),False)
+        self.assertEqual(self.A.add((1,0,0)),True)
+        self.assertEqual(self.A.to_list(),[[0,1,-1],[0,-1,1],[1,0,0]])
+        self.assertTrue([1,0,0] in self.A)
+        self.assertFalse([1,1,0] in self.A)
+
+    def test_extend(self):
+        B = numpy.array([[0,-1,1],[2,0,0],[2,0,0]])
+        self.assertEqual(self.A.extend(B),1)
+        self.assertEqual(self.A[2],[2,0,0])
+        self.assertEqual(type(self.A[2][0]),int)
+
+    def test_sort(self):
+        self.A.sort()
+        self.assertEqual(self.A.to_list(),[[0,-1,1],[0,1,-1]])
+        self.assertEqual(self.A.add([0,1,-1]),False)
+
+    def test_export(self):
+        self.assertEqual(self.A.to_array().tolist(),[[0,1,-1],[0,-1,1]])
+        M = self.A.to_cdd(cdd.RepType.INEQUALITY)
+        self.assertEqual(M.row_size,2)
+        self.assertEqual(M.rep_type,cdd.RepType.INEQUALITY)
+        self.assertEqual(list(M[1]),[0,-1,1])
+
+    def test_lp_constraints(self):
+        x = pulp.LpVariable.dicts("x",range(2))
+        C = self.A.lp_constraints(x,offset=1)
+        self.assertEqual(len(C),2)
+        self.assertEqual(C[0].sense,pulp.LpConstraintLE)
+        self.assertEqual(dict(C[0]),{x[0]:1,x[1]:-1})
+
+class TestSeparationLP(unittest.TestCase):
+
+    def test_solve(self):
+        # x[0] >= 0, x[1] >= 0 and x[0] + x[1] <= 0
+        lp = SeparationLP([[0,-1,0],[0,0,-1],[0,1,1]],offset=1)
+        self.assertEqual(lp.solve([0,1,1]),None)
+        self.assertEqual(lp.solve([0,-1,0]),None)
+        lp = SeparationLP([[0,-1,0],[0,1,-1]],offset=1)
+        x = lp.solve([0,1,0])
+        self.assertTrue(x[0] >= 1 and x[1] >= x[0])
+        self.assertEqual(lp.solve([0,-1,0]),None)
+        self.assertEqual(pickle.loads(pickle.dumps(lp)).solve([0,-1,0]),None)
+
+class TestMembershipLP(unittest.TestCase):
+
+    def test_solve(self):
+        A = [[1,-1,0],[0,1,-1]]
+        lp = MembershipLP(A,3)
+        self.assertEqual(lp.solve([2,-1,-1]),(True,[2.0,1.0]))
+        (ans,z) = lp.solve([-1,1,0])
+        self.assertFalse(ans)
+        for row in A:
+            self.assertTrue(sum(a*x for (a,x) in zip(row,z)) <= 0)
+        self.assertTrue(sum(a*x for (a,x) in zip([-1,1,0],z)) > 0)
+        lp.add_rows([[-1,1,0]])
+        self.assertEqual(lp.solve([-1,1,0]),(True,[0.0,0.0,1.0]))
+
+    def test_solve_again(self):
+        # The right hand side is changed in place, and marked for
+        # solvers which resolve
+        lp = MembershipLP([[1,0],[0,1]],2)
+        self.assertEqual(lp.solve([1,2]),(True,[1.0,2.0]))
+        # As after a solver resolving in process
+        for c in lp.prob.constraints.values():
+            c.modified = False
+        self.assertEqual(lp.solve([3,1]),(True,[3.0,1.0]))
+        self.assertTrue(all(c.modified for c in lp.prob.constraints.values()))
+        self.assertEqual(lp.solve([-1,1])[0],False)
+        self.assertEqual(lp.solve([1,2]),(True,[1.0,2.0]))
+
+def suite():
+
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestInequalityMatrix))
+    suite.addTest(unittest.makeSuite(TestSeparationLP))
+    suite.addTest(unittest.makeSuite(TestMembershipLP))
+    return suite
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
-from wpolyanna.op import Operation, ExplicitOperation, Projection
+from wpolyanna.op import Operation, ExplicitOperation, TableOperation, Projection
+from wpolyanna.op import compose_tables
 from wpolyanna.exception import *
 
 class TestOperation(unittest.TestCase):
@@ -104,23 +105,92 @@ class TestOperation(unittest.TestCase):
         self.assertNotEqual(proj[1][(0,1)],0)
         self.assertEqual(proj[0].compose([self.f,self.g]),self.f)
         self.assertEqual(proj[1].compose([self.f,self.g]),self.g)
-        self.assertEqual(hash(proj[0]),2)
-        self.assertEqual(hash(proj[1]),2)
+        self.assertEqual(hash(proj[0]),hash(self.proj[0]))
+        self.assertEqual(hash(proj[1]),hash(self.proj[1]))
+        self.assertNotEqual(hash(proj[0]),hash(proj[1]))
         self.assertEqual(proj[0],eval(repr(proj[0])))
         
     def test_hash(self):
-        self.assertEqual(hash(self.f),2)
-        self.assertEqual(hash(self.g),3)
-        self.assertEqual(hash(self.dom3),8)
+        self.assertEqual(hash(self.f),hash(self.fcopy))
+        self.assertNotEqual(hash(self.f),hash(self.g))
+        # Permuting the values must change the hash
+        self.assertNotEqual(hash(self.F[0]),hash(self.F[0].compose(
+            [Projection(3,2,2),Projection(3,2,1),Projection(3,2,0)])))
+        self.assertEqual(self.f.fingerprint(),
+                         TableOperation(2,2,[1,0,0,1]).fingerprint())
 
     def test_repr(self):
         self.assertEqual(self.f,eval(repr(self.f)))
-        
+
+class TestTableOperation(unittest.TestCase):
+
+    def setUp(self):
+        self.g = ExplicitOperation(2,2,
+                                   {(0,0):0, (0,1):1, (1,0):1, (1,1):1})
+        self.gtable = TableOperation(2,2,[0,1,1,1])
+        self.dom3 = ExplicitOperation(2,3,
+                                      {(0,0):0, (0,1):1, (1,0):1, (1,1):1,
+                                       (0,2):0, (2,0):0, (2,2):2,
+                                       (1,2):1, (2,1):2})
+
+    def test_getitem(self):
+        self.assertEqual(self.gtable[0,0],0)
+        self.assertEqual(self.gtable[1,0],1)
+        self.assertRaises(ArityError,self.gtable.__getitem__,(0,1,0))
+        self.assertRaises(DomainError,self.gtable.__getitem__,(0,2))
+
+    def test_convert(self):
+        self.assertEqual(self.gtable.to_dict(),self.g.f)
+        self.assertEqual(TableOperation.from_dict(2,2,self.g.f).value_tuple(),
+                         (0,1,1,1))
+        t = TableOperation.from_operation(self.dom3)
+        self.assertEqual(t.to_explicit().f,self.dom3.f)
+        self.assertEqual(t.value_tuple(),self.dom3.value_tuple())
+
+    def test_eq(self):
+        self.assertEqual(self.gtable,self.g)
+        self.assertEqual(self.g,self.gtable)
+        self.assertNotEqual(TableOperation(2,2,[0,0,0,1]),self.g)
+        self.assertEqual(hash(self.gtable),hash(self.g))
+
+    def test_apply_to_tableau(self):
+        X = [(0,1,0),(1,0,0)]
+        self.assertEqual(self.gtable.apply_to_tableau(X),(1,1,0))
+        self.assertRaises(ArityError,self.gtable.apply_to_tableau,[(1,1,0)])
+        self.assertRaises(DomainError,self.gtable.apply_to_tableau,
+                          [(2,0),(0,1)])
+
+    def test_compose(self):
+        p = [Projection(2,3,0),Projection(2,3,1)]
+        h = TableOperation.from_operation(self.dom3).compose([p[1],p[0]])
+        self.assertTrue(isinstance(h,TableOperation))
+        self.assertEqual(h,ExplicitOperation(2,3,dict(((y,x),v) for ((x,y),v)
+                                                      in self.dom3.f.items())))
+        self.assertEqual(self.dom3.compose([self.dom3,p[0]]).value_tuple(),
+                         (0,1,0,1,1,1,0,2,2))
+
+    def test_compose_tables(self):
+        p = [Projection(2,3,0),Projection(2,3,1)]
+        F = [(self.dom3,p[0]),(p[1],self.dom3),(p[1],p[0])]
+        stack = [[f.value_table() for f in t] for t in F]
+        G = compose_tables(self.dom3.value_table(),stack,3)
+        for (t,g) in zip(F,G):
+            self.assertEqual(tuple(g),self.dom3.compose(t).value_tuple())
+
+    def test_is_projection(self):
+        self.assertTrue(TableOperation(2,2,[0,0,1,1]).is_projection())
+        self.assertTrue(TableOperation(2,2,[0,1,0,1]).is_projection())
+        self.assertFalse(self.gtable.is_projection())
+
+    def test_repr(self):
+        self.assertEqual(self.gtable,eval(repr(self.gtable)))
+
 def suite():
 
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(TestOperation))
     suite.addTest(unittest.makeSuite(TestExplicitOperation))
+    suite.addTest(unittest.makeSuite(TestTableOperation))
     suite.addTest(unittest.makeSuite(TestProjection))
     return suite
         
@@ -0,0 +1,27 @@
+import unittest
+
+from wpolyanna import parallel
+
+def scale(x):
+    return parallel.shared['factor'] * x
+
+class TestParallel(unittest.TestCase):
+
+    def test_pool_map(self):
+        items = range(10)
+        expected = [3*x for x in items]
+        self.assertEqual(parallel.pool_map(scale,items,None,{'factor': 3}),
+                         expected)
+        self.assertEqual(parallel.pool_map(scale,items,4,{'factor': 3}),
+                         expected)
+        self.assertEqual(parallel.shared,dict())
+
+def suite():
+
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestParallel))
+    return suite
+
+if __name__ == '__main__':
+
+    unittest.main()
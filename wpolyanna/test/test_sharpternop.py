@@ -1,6 +1,6 @@
 import unittest
 
-from wpolyanna import Projection
+from wpolyanna import Projection, TableOperation
 from wpolyanna.sharpternop import *
 
 class TestSharpTernary(unittest.TestCase):
@@ -66,6 +66,9 @@ class TestSharpTernary(unittest.TestCase):
         self.assertEqual(self.min,minority(3,self.f))
         self.assertNotEqual(self.min,minority(3,self.g))
         self.assertNotEqual(self.maj,self.min)
+        table = TableOperation.from_operation(self.maj)
+        self.assertEqual(table,self.maj)
+        self.assertEqual(hash(table),hash(self.maj))
 
     def test_repr(self):
         self.assertEqual(self.min,eval(repr(self.min)))
@@ -5,8 +5,10 @@ from wpolyanna import Projection
 from wpolyanna import Clone
 from wpolyanna import WeightedOperation
 from wpolyanna import CostFunction
+from wpolyanna import wpol
 from wpolyanna.submodular import Submodular
 from wpolyanna.submodular import MinMax
+from wpolyanna.submodular import monotone_functions
 
 class TestMinMax(unittest.TestCase):
 
@@ -37,6 +39,8 @@ class TestMinMax(unittest.TestCase):
         self.assertEqual(self.min2,self.min2copy)
         self.assertEqual(self.proj3[0],Projection(3,2,0))
         self.assertEqual(Projection(3,2,0),self.proj3[0])
+        self.assertEqual(hash(Projection(3,2,0)),hash(self.proj3[0]))
+        self.assertNotEqual(self.proj3[1],Projection(3,2,0))
         
     def test_le(self):
         self.assertTrue(self.min2 < self.max2)
@@ -61,6 +65,8 @@ class TestMinMax(unittest.TestCase):
         self.assertTrue(self.proj3[0].is_projection())
         self.assertFalse(self.min2.is_projection())
         self.assertFalse(self.max2.is_projection())
+        # The family {{}} is a constant
+        self.assertFalse(MinMax(2,[[]]).is_projection())
 
     def test_compose(self):
         self.assertEqual(self.min2.compose((self.proj3[0],self.proj3[1])),
@@ -80,6 +86,52 @@ class TestMinMax(unittest.TestCase):
     def test_clone(self):
         self.assertEqual(MinMax.clone(3),Clone(self.C3))
         self.assertEqual(Clone.generate([self.min2,self.max2],3),MinMax.clone(3))
+        C = MinMax.clone(4,3)
+        self.assertEqual(len(C),166)
+        self.assertEqual([C[i] for i in range(4)],
+                         [MinMax(4,[[i]],3) for i in range(4)])
+        f = MinMax(4,[[0,1],[2,3]],3)
+        self.assertEqual(C[C.get_index(f)],f)
+        self.assertEqual(C.value_rows(5,6)[0].tolist(),
+                         C[5].value_table().tolist())
+        self.assertTrue(f in C)
+        self.assertFalse(ExplicitOperation(2,3,{(0,0):0,(0,1):0,(0,2):0,
+                                                (1,0):0,(1,1):1,(1,2):2,
+                                                (2,0):0,(2,1):2,(2,2):2})
+                         in MinMax.clone(2,3))
+
+    def test_clone_wpol(self):
+        # The projections come first, as wop_ineq assumes, so only
+        # projections may have negative weight. When the clone did not
+        # start with them, a single weighted polymorphism was found.
+        unary = [CostFunction(1,2,{(0,):1,(1,):0}),
+                 CostFunction(1,2,{(0,):0,(1,):1})]
+        softimp = CostFunction(2,2,{(0,0):0,(0,1):0,(1,0):1,(1,1):0})
+        C = MinMax.clone(3)
+        W = wpol(unary + [softimp],3,C)
+        self.assertEqual(len(W),29)
+        for w in W:
+            for (f,x) in w.weight_iter():
+                self.assertTrue(x >= 0 or C.get_index(f) < 3)
+            for cf in unary + [softimp]:
+                self.assertEqual(w.improves(cf),True)
+        sm = WeightedOperation(3,2,self.proj3[:2] + [MinMax(3,[[0,1]]),
+                                                     MinMax(3,[[0],[1]])],
+                               [-1,-1,1,1])
+        self.assertTrue(sm in W)
+
+    def test_covers(self):
+        C = MinMax.clone(2)
+        self.assertEqual(C.covers().tolist(),[[0,3],[1,3],[2,0],[2,1]])
+        self.assertEqual(C.meet([0,1],[1,3]).tolist(),[2,1])
+        self.assertEqual(C.join([0,2],[1,1]).tolist(),[3,1])
+        self.assertTrue(MinMax.clone(2) is C)
+
+    def test_monotone_functions(self):
+        self.assertEqual([len(monotone_functions(k)) for k in range(5)],
+                         [2,3,6,20,168])
+        self.assertEqual(monotone_functions(2).tolist(),
+                         [0,8,10,12,14,15])
 
 class TestSubmodular(unittest.TestCase):
 
@@ -94,7 +146,25 @@ class TestSubmodular(unittest.TestCase):
 
     def test_translations(self):
         self.assertEqual(self.sm.translations(2),[[-1,-1,1,1]])
+        C = Clone.generate([MinMax(2,[[0,1]]),MinMax(2,[[0],[1]])],3)
+        A = self.sm.translations(3,C)
+        self.assertEqual(len(A),15)
+        self.assertEqual(sorted(map(sorted,A)),
+                         sorted(map(sorted,self.sm.translations(3))))
                          
+    def test_improves(self):
+        cf1 = CostFunction(2,2,{(0,0):0,(0,1):0,(1,0):1,(1,1):1})
+        cf3 = CostFunction(3,2,{(0,0,0):1,(0,0,1):0,(0,1,0):1,(0,1,1):0,
+                                (1,0,0):1,(1,0,1):0,(1,1,0):0,(1,1,1):0})
+        self.assertEqual(self.sm.improves(cf1),True)
+        self.assertEqual(self.sm.improves(cf3),(False,[0,0,0,0,1,-1,-1,1]))
+        cf = CostFunction(2,3,dict(((x,y),max(x,y)-min(x,y)+3*(x*y == 1))
+                                   for x in range(3) for y in range(3)))
+        self.assertEqual(Submodular(3).improves(cf),
+                         (False,[0,0,0,0,1,-1,0,-1,1]))
+        self.assertEqual(self.sm.improves_many([cf3,cf1]),
+                         [self.sm.improves(cf3),True])
+
     def test_in_wclone(self):
         self.assertTrue(self.sm.in_wclone(self.wop3))
         self.assertTrue(self.wop3.in_wclone(self.sm,MinMax.clone(2)))
@@ -0,0 +1,73 @@
+import unittest
+import itertools as it
+
+import numpy
+
+from wpolyanna.op import ExplicitOperation, Projection
+from wpolyanna.clone import Clone
+from wpolyanna import tableau
+
+class TestTableau(unittest.TestCase):
+
+    def setUp(self):
+        cf = dict()
+        for i in range(3):
+            for j in range(3):
+                cf[i,j] = max(i,j)
+        self.f = ExplicitOperation(2,3,cf)
+        self.clone = Clone([Projection(2,3,0),Projection(2,3,1),self.f])
+        self.tuples = list(it.product(range(3),repeat=2))
+
+    def test_combinations(self):
+        X = numpy.vstack(list(tableau.combinations(4,3,block=7)))
+        self.assertEqual(map(tuple,X.tolist()),
+                         list(it.combinations_with_replacement(range(4),3)))
+
+    def test_products(self):
+        S = [[1,3],[0],[2,5,6]]
+        X = numpy.vstack(list(tableau.products(S,block=4)))
+        self.assertEqual(map(tuple,X.tolist()),list(it.product(*S)))
+        self.assertEqual(list(tableau.products([[1],[]])),[])
+
+    def test_apply_tables(self):
+        tables = self.clone.value_matrix()
+        X = numpy.array(list(it.product(range(9),repeat=2)))
+        Y = tableau.apply_tables(tables,X,2,3)
+        for k in range(len(self.clone)):
+            for b in range(len(X)):
+                T = [self.tuples[i] for i in X[b]]
+                self.assertEqual(self.tuples[Y[k,b]],
+                                 self.clone[k].apply_to_tableau(T))
+
+    def test_weighted_rows(self):
+        tables = self.clone.value_matrix()
+        X = numpy.array([[1,3],[4,4]])
+        A = tableau.weighted_rows(tables,[1,1,-2],X,2,3)
+        self.assertEqual(A.tolist(),
+                         [[0,1,0,1,-2,0,0,0,0],[0,0,0,0,0,0,0,0,0]])
+
+    def test_split_combinations(self):
+        for k in range(4):
+            X = numpy.vstack(list(tableau.split_combinations([0,3],[1,2,4],
+                                                             k,3,block=2)))
+            self.assertEqual(sorted(X.tolist()),
+                             sorted(list(c) for c in
+                                    it.combinations_with_replacement(range(5),3)
+                                    if sum(x in (0,3) for x in c) == k))
+        self.assertEqual(len(list(tableau.split_combinations([],[1],1,2))),0)
+
+    def test_cost_rows(self):
+        costs = numpy.arange(9)
+        X = numpy.array([[1,3],[2,8]])
+        A = tableau.cost_rows(self.clone,costs,X,2,3,block=1)
+        self.assertEqual(A.tolist(),[[1,3,4],[2,8,8]])
+
+def suite():
+
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(TestTableau))
+    return suite
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from fractions import Fraction
 
 import wpolyanna.op
 import wpolyanna.wop
@@ -6,6 +7,7 @@ import wpolyanna.cost_function
 from wpolyanna.op import ExplicitOperation, Projection
 from wpolyanna.wop import WeightedOperation
 from wpolyanna.cost_function import CostFunction
+from wpolyanna.clone import Clone
 
 class TestWeightedOperation(unittest.TestCase):
 
@@ -68,6 +70,11 @@ class TestWeightedOperation(unittest.TestCase):
                          [1,-2,-2,3],
                          [0,-1,0,1],
                          [0,0,-1,1]]))
+        # Reverse the order of the tuples
+        index = {(0,0):3,(0,1):2,(1,0):1,(1,1):0}
+        self.assertEqual(self.sm.imp_ineq(2,index),[[1,-1,-1,1]])
+        self.assertEqual(self.nsm.imp_ineq(2,index),
+                         sorted([row[::-1] for row in self.nsm.imp_ineq(2)]))
 
     def test_imp(self):
         bsm = []
@@ -83,13 +90,87 @@ class TestWeightedOperation(unittest.TestCase):
         self.assertEqual(self.sm.improves(self.cf1),True)
         self.assertEqual(self.nsm.improves(self.cf1),(False,[-1,0,0,1]))
         self.assertEqual(self.sm.improves(self.cf3),(False,[0,0,0,0,1,-1,-1,1]))
+        self.assertEqual(self.sm.improves(self.cf1,smallest=False),True)
+        for (wop,cf) in [(self.nsm,self.cf1),(self.sm,self.cf3)]:
+            (ans,e) = wop.improves(cf,smallest=False)
+            self.assertFalse(ans)
+            self.assertTrue(e in wop.imp_ineq(cf.arity))
+            self.assertTrue(sum(a*c for (a,c) in zip(e,cf.cost_tuple())) > 0)
     
+    def test_is_wpol(self):
+        self.assertTrue(self.sm.is_wpol(self.cf1))
+        self.assertTrue(self.sm.is_wpol(self.cf2))
+        self.assertFalse(self.nsm.is_wpol(self.cf1))
+        self.assertFalse(self.sm.is_wpol(self.cf3))
+
+    def test_fractions(self):
+        # Rational weights and costs give arrays of objects
+        h = Fraction(1,2)
+        sm = WeightedOperation(2,2,self.proj2 + [self.min2,self.max2],
+                               [-h,-h,h,h])
+        self.assertEqual(sm.imp_ineq(2),[[h,-h,-h,h]])
+        cf = CostFunction(2,2,{(0,0):0,(0,1):h,(1,0):Fraction(1,3),(1,1):0})
+        self.assertEqual(sm.improves(cf),True)
+        cf = CostFunction(2,2,{(0,0):h,(0,1):0,(1,0):0,(1,1):0})
+        self.assertEqual(sm.improves(cf),(False,[h,-h,-h,h]))
+        self.assertEqual(sm.improves_many([self.cf1,cf]),
+                         [True,(False,[h,-h,-h,h])])
+
+    def test_improves_many(self):
+        cfs = [self.cf1,self.cf2,self.cf3]
+        for wop in [self.sm,self.nsm]:
+            answers = [wop.improves(cf) for cf in cfs]
+            self.assertEqual(wop.improves_many(cfs),answers)
+            self.assertEqual(wop.improves_many(cfs,block=1),answers)
+            self.assertEqual(wop.improves_many(cfs,workers=2),answers)
+        (start,cols,vals) = self.sm.imp_matrix(2)
+        self.assertEqual((start.tolist(),cols.tolist(),vals.tolist()),
+                         ([0,4],[0,1,2,3],[1,-1,-1,1]))
+        self.assertEqual(self.sm.improves_many([]),[])
+
     def test_translations(self):
         self.assertEqual(self.sm.translations(2),[[-1,-1,1,1]])
+        rows = self.sm.translations(3)
+        self.sm.group = [(0,1)]
+        self.assertEqual(self.sm.translations(3),rows)
+
+    def test_symmetry_group(self):
+        self.assertEqual(self.sm.symmetry_group(),[(0,1),(1,0)])
+        self.assertEqual(self.nsm.symmetry_group(),[(0,1),(1,0)])
+        wop = WeightedOperation(2,2,self.proj2 + [self.min2,self.max2],
+                                [-2,-1,1,2])
+        self.assertEqual(wop.symmetry_group(),[(0,1)])
+        maj = ExplicitOperation(3,2,dict(((x,y,z),int(x+y+z >= 2))
+                                         for x in range(2)
+                                         for y in range(2)
+                                         for z in range(2)))
+        proj3 = [Projection(3,2,i) for i in range(3)]
+        wop = WeightedOperation(3,2,proj3 + [maj],[-1,-1,-2,4])
+        self.assertEqual(wop.symmetry_group(),[(0,1,2),(1,0,2)])
+        rows = wop.translations(3)
+        wop.group = [(0,1,2)]
+        self.assertEqual(wop.translations(3),rows)
+
+    def test_translate(self):
+        clone = Clone.generate([self.min2,self.max2],2)
+        row = self.sm.translate([self.proj2[1],self.proj2[0]],clone)
+        self.assertEqual(row,[-1,-1]+[1,1])
+        row = self.sm.translate([self.min2,self.proj2[0]],clone)
+        self.assertEqual(row[clone.get_index(self.min2)],0)
+        self.assertEqual(row[clone.get_index(self.proj2[0])],0)
         
     def test_in_wclone(self):
         (ans,cert) = self.sm.in_wclone(self.nsm)
         self.assertFalse(ans)
+        # The separating cost function satisfies every translation and
+        # is violated by nsm
+        clone = Clone.generate(self.sm.ops,2)
+        z = [cert[f.value_tuple()] for f in clone]
+        self.assertTrue(min(z) == 0)
+        for row in self.sm.translations(2,clone):
+            self.assertTrue(sum(a*c for (a,c) in zip(row,z)) <= 0)
+        self.assertTrue(sum(a*c for (a,c) in
+                            zip(self.nsm.weight_row(clone),z)) > 0)
         F = [ExplicitOperation(3,2,{(0,0,0):0,(0,0,1):1,(0,1,0):1,(0,1,1):1,
                                     (1,0,0):1,(1,0,1):1,(1,1,0):1,(1,1,1):1}),
              ExplicitOperation(3,2,{(0,0,0):0,(0,0,1):0,(0,1,0):0,(0,1,1):0,
@@ -101,6 +182,34 @@ class TestWeightedOperation(unittest.TestCase):
         (ans2,cert2) = self.sm.in_wclone(omega)
         self.assertTrue(ans2)
     
+    def test_in_wclone_colgen(self):
+        (ans,cf) = self.sm.in_wclone_colgen(self.nsm,columns=1,block=3)
+        self.assertFalse(ans)
+        clone = Clone.generate(self.sm.ops,2)
+        z = [cf[f.value_tuple()] for f in clone]
+        for row in self.sm.translations(2,clone):
+            self.assertTrue(sum(a*c for (a,c) in zip(row,z)) <= 0)
+        self.assertTrue(sum(a*c for (a,c) in
+                            zip(self.nsm.weight_row(clone),z)) > 0)
+        (ans,cert) = self.sm.in_wclone_colgen(self.sm)
+        self.assertTrue(ans)
+        self.assertEqual(cert,self.sm.in_wclone(self.sm)[1])
+
+    def test_in_wclone_many(self):
+        others = [self.nsm,self.sm,
+                  WeightedOperation(2,2,[self.proj2[0],self.max2],[-1,1])]
+        for workers in [None,2]:
+            answers = self.sm.in_wclone_many(others,workers=workers)
+            self.assertEqual(len(answers),3)
+            for (other,answer) in zip(others,answers):
+                expected = self.sm.in_wclone(other)
+                self.assertEqual(answer[0],expected[0])
+                if answer[0]:
+                    self.assertEqual(answer[1],expected[1])
+                else:
+                    self.assertEqual(answer[1].costs,expected[1].costs)
+        self.assertEqual(self.sm.in_wclone_many([]),[])
+
     def test_wclone(self):
         self.assertEqual(self.sm.wclone(2),[self.sm])
         W = [self.nsm,
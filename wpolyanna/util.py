@@ -1,3 +1,101 @@
+import numpy
+
+def table_dtype(dom):
+    """ Return the smallest unsigned integer type which can hold every
+    element of a domain.
+
+    :param dom: the domain size
+    :type dom: int
+    :returns: a numpy integer type
+    """
+    if dom <= 1 << 8:
+        return numpy.uint8
+    elif dom <= 1 << 16:
+        return numpy.uint16
+    else:
+        return numpy.uint32
+
+def tuple_index(x,dom):
+    """ Return the position of a tuple in the lexicographic ordering of
+    all tuples of the same length, i.e. its mixed-radix encoding.
+
+    :param x: a tuple of elements of {0,...,dom-1}
+    :param dom: the domain size
+    :returns: the index of x in product(range(dom),repeat=len(x))
+    :rtype: int
+    """
+    i = 0
+    for a in x:
+        i = i*dom + a
+    return i
+
+def index_tuple(i,arity,dom):
+    """ Inverse of :func:`tuple_index`.
+
+    :returns: the i-th tuple of product(range(dom),repeat=arity)
+    :rtype: tuple of int
+    """
+    x = [0]*arity
+    for j in range(arity-1,-1,-1):
+        i,x[j] = divmod(i,dom)
+    return tuple(x)
+
+def radix(arity,dom):
+    """ Return the place values used by :func:`tuple_index`.
+
+    :returns: the array (dom**(arity-1),...,dom,1)
+    :rtype: :class:`numpy.ndarray`
+    """
+    return dom**numpy.arange(arity-1,-1,-1,dtype=numpy.int64)
+
+_tuple_arrays = dict()
+
+def tuple_array(arity,dom):
+    """ Return all tuples of a given length as the rows of an array, in
+    lexicographic order. The result is cached and must not be modified.
+
+    :returns: an array of shape (dom**arity,arity)
+    :rtype: :class:`numpy.ndarray`
+    """
+    try:
+        return _tuple_arrays[arity,dom]
+    except KeyError:
+        n = dom**arity
+        X = (numpy.arange(n)[:,None] // radix(arity,dom)) % dom
+        X = X.astype(table_dtype(dom))
+        X.setflags(write=False)
+        _tuple_arrays[arity,dom] = X
+        return X
+
+def index_tuples(ranges,distinct=False,block=1 << 16):
+    """ Generate the product of a list of ranges in blocks.
+
+    :param ranges: a list of pairs (a,b), standing for range(a,b)
+    :param distinct: Flag to request only tuples with distinct entries.
+    :type distinct: boolean, optional
+    :param block: the number of tuples considered in each block
+    :returns: an iterator over arrays whose rows are the tuples in the
+        product, in lexicographic order.
+    """
+    sizes = [max(b-a,0) for (a,b) in ranges]
+    total = 1
+    for n in sizes:
+        total *= n
+    for start in range(0,total,block):
+        code = numpy.arange(start,min(start+block,total))
+        T = numpy.empty((len(code),len(ranges)),dtype=numpy.intp)
+        for j in range(len(ranges)-1,-1,-1):
+            (code,T[:,j]) = divmod(code,sizes[j])
+            T[:,j] += ranges[j][0]
+        if distinct:
+            keep = numpy.ones(len(T),dtype=bool)
+            for j in range(len(ranges)):
+                for i in range(j):
+                    keep &= T[:,i] != T[:,j]
+            T = T[keep]
+        if len(T) > 0:
+            yield T
+
 def binary_search(L,target):
     """ Find the index of target in a sorted list L.
 
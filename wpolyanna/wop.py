@@ -1,11 +1,16 @@
-import string, copy
+import string, copy, sys, math
 import itertools as it
 import cdd, pulp
+import numpy
 
-from wpolyanna.util import binary_search
+from wpolyanna.inequality import InequalityMatrix, MembershipLP
 from wpolyanna.op import Operation
 from wpolyanna.clone import Clone
+from wpolyanna.op import compose_tables
+from wpolyanna.util import tuple_array, radix, index_tuples
 import wpolyanna.cost_function
+from wpolyanna import tableau
+from wpolyanna import parallel
 from wpolyanna.cost_function import CostFunction
 
 """
@@ -35,6 +40,8 @@ class WeightedOperation:
         Create a new weighted operation.
         """
         self.hash = -1
+        self.group = None
+        self.imps = dict()
         self.arity = arity
         self.dom = dom
         self.ops = ops
@@ -75,6 +82,34 @@ class WeightedOperation:
         """ Return an iterator over (operation,weight) pairs. """
         return self.weight.iteritems()
 
+    def expand_orbits(self,clone):
+        """ Return the symmetric weighted operation with the same weight
+        on each orbit as this one has on its representative.
+
+        :param clone: The supporting clone, which contains the
+            operations of this weighted operation.
+        :type clone: :class:`Clone`
+        :returns: The weighted operation which assigns the weight of
+            each operation to every operation obtained from it by
+            permuting arguments.
+        :rtype: :class:`WeightedOperation`
+
+        .. note:: This recovers the weighted polymorphisms returned by
+            :meth:`CostFunction.wpol` with the flag symmetric. If the
+            clone is not closed under permuting arguments, this weighted
+            operation is returned unchanged.
+        """
+        perm = clone.permutation_table()
+        if perm is None:
+            return self
+        ops = []
+        weights = []
+        for (f,w) in self.weight_iter():
+            for j in sorted(set(perm[1][:,clone.get_index(f)].tolist())):
+                ops.append(clone[j])
+                weights.append(w)
+        return WeightedOperation(self.arity,self.dom,ops,weights)
+
     def __eq__(self,other):
         """ Test for equality. """
         return ( self.dom == other.dom
@@ -109,7 +144,7 @@ class WeightedOperation:
 
     def __hash__(self):
         if self.hash < 0:
-            self.hash = int(sum(w*hash(f) for (f,w) in self.weight_iter()))
+            self.hash = hash(frozenset(self.weight_iter())) & sys.maxint
         return self.hash
     
     def imp_ineq(self,r,index=None):
@@ -133,41 +168,55 @@ class WeightedOperation:
         :rtype: :py:func:`list` of :py:func:`list` of integer            
         """
         
-        if index is None:
-            # Compute an index for the tuples
-            index = dict()
-            i = 0
-            for x in it.product(range(self.dom),repeat=r):
-                index[x] = i
-                i += 1
-
-        # The inequalities Ax <= 0 will define the cone of cost functions
-        A = []        
-
-        # Iterate over the tableaux
-        # For each such X, we compute the tableau
-        # obtained by applying the operations to X
-        # We then generate the constraint this imposes
-        # on a cost function, and add this to our matrix,
-        # as long as it is non-zero
-        D = range(self.dom)
-        for X in it.combinations_with_replacement(
-            it.product(D,repeat=r),self.arity):
-            row = [0 for _ in range(self.dom**r)]
-            for f in self.get_support():
-                y = f.apply_to_tableau(X)
-                row[index[y]] += self.get_weight(f)
-            #Y = [f.apply_to_tableau(X) for f in self.ops]
-            #for i in range(len(Y)):
-            #    row[index[Y[i]]] += self.weights[i]
-            if max([i != 0 for i in row]):
-                if len(A) == 0:
-                    A = [row]
-                else:
-                    i = binary_search(A,row)
-                    if i == len(A) or A[i] != row:
-                        A.insert(i,row)
-        return A
+        if index is not None:
+            # The position of each tuple, in lexicographic order
+            perm = [index[x] for x in it.product(range(self.dom),repeat=r)]
+
+        # The inequalities Ax <= 0 will define the cone of cost
+        # functions. Each non-zero row is kept once, in sorted order.
+        A = InequalityMatrix()
+        for B in self.imp_rows(r):
+            if index is not None:
+                P = numpy.zeros_like(B)
+                P[:,perm] = B
+                B = P
+            A.extend(B)
+        A.sort()
+        return A.to_list()
+
+    def imp_rows(self,r,block=1 << 14,order=None):
+        """ Generate the inequalities imposed by the tableaux of r-tuples,
+        a block at a time.
+
+        :param r: The arity of the cost functions.
+        :type r: integer
+        :param block: The number of tableaux in each block.
+        :type block: integer, Optional
+        :param order: The positions of the r-tuples, in the order in
+            which they should be used. The tableaux are then visited
+            in the order of :func:`itertools.combinations_with_replacement`
+            of this list, and the rows of each are sorted, so the same
+            inequalities are generated.
+        :type order: :class:`numpy.ndarray`, Optional
+        :returns: An iterator over arrays, whose rows are the non-zero
+            inequalities given by each block of tableaux.
+        :rtype: iterator of :class:`numpy.ndarray`
+
+        .. note:: The tableaux are visited in the same order as
+            :func:`itertools.combinations_with_replacement` of the
+            r-tuples, and each block is evaluated for every supporting
+            operation at once (see :mod:`wpolyanna.tableau`).
+        """
+        support = self.get_support()
+        tables = numpy.array([f.value_table() for f in support])
+        weights = [self.get_weight(f) for f in support]
+        for X in tableau.combinations(self.dom**r,self.arity,block):
+            if order is not None:
+                X = numpy.sort(order[X],axis=1)
+            B = tableau.weighted_rows(tables,weights,X,r,self.dom)
+            B = B[(B != 0).any(axis=1)]
+            if len(B) > 0:
+                yield B
     
     def imp(self,r,maxcsp=False):
         """ Generate the set of cost functions improved by this
@@ -183,13 +232,13 @@ class WeightedOperation:
         :rtype: :py:class:`set` of :class:`CostFunction`
         """
 
-        A = []
+        A = InequalityMatrix()
         
         # All costs >= 0
         for i in range(self.dom**r):
             row = [0 for _ in range(self.dom**r+1)]
             row[i+1] = 1
-            A.append(row)
+            A.add(row)
 
         # If MaxCSP we have all costs <= 1
         if maxcsp:
@@ -197,14 +246,13 @@ class WeightedOperation:
                 row = [0 for _ in range(self.dom**r+1)]
                 row[i+1] = -1
                 row[0] = -1
-            A.append(row)
+            A.add(row)
             
         # Get the imp inequalities
         for row in self.imp_ineq(r):
-            if not row in A:
-                A.append([0] + map(lambda x: -x, row))
+            A.add([0] + map(lambda x: -x, row))
                 
-        ineq_matrix = cdd.Matrix(A)
+        ineq_matrix = A.to_cdd()
         imp_polyhedron = cdd.Polyhedron(ineq_matrix)
         ray_mat = imp_polyhedron.get_generators()
         cost_functions = []
@@ -219,28 +267,141 @@ class WeightedOperation:
             cost_functions.append(CostFunction(r,self.dom,cf))
         return cost_functions
 
-    def improves(self,cf):
+    def improves(self,cf,smallest=True):
         """ Test if this weighted operation improves a particular cost
         function. If the cost function is not improved, then we return
         a certificate of this fact.
 
         :param cf: The cost function we are checking.
         :type cf: :class:`CostFunction`
-        :returns: The first violated inequality, if cf is not improved
-            by this weighted operation, and an empty list otherwise.
-        :rtype: :py:func:`list` of rational
+        :param smallest: Flag to request the smallest violated
+            inequality, in the order of imp_ineq. Every tableau is then
+            visited, even if cf is not improved. Otherwise, the tableaux
+            are visited starting from the tuples of lowest cost, which
+            are the most likely to give a violated inequality, and we
+            stop at the first violated inequality.
+        :type smallest: boolean, optional
+        :returns: True if cf is improved by this weighted operation, and
+            a pair (False,e) otherwise, where e is a violated inequality
+            of imp_ineq: the smallest one if smallest is True.
+        :rtype: boolean, or (boolean, :py:func:`list` of rational)
+
+        .. note:: Only smallest=False stops early, so use it when the
+            certificate does not need to be the smallest one, or
+            :meth:`is_wpol` when no certificate is needed.
         """
-        r = cf.arity
-        D = range(self.dom)
-        # Compute an ordered list of tuples
-        tuples = []
-        for x in it.product(D,repeat=r):
-            tuples.append(x)
-        for e in self.imp_ineq(r):
-            if sum(cf[tuples[i]]*e[i] for i in range(len(e)) if e[i] != 0) > 0:
-                return False,e
-        return True
+        costs = cf.cost_table()
+        if not smallest:
+            order = numpy.argsort(costs,kind='mergesort')
+            for B in self.imp_rows(cf.arity,block=1 << 10,order=order):
+                e = numpy.flatnonzero(B.dot(costs) > 0)
+                if len(e) > 0:
+                    return False,B[e[0]].tolist()
+            return True
+        # The smallest violated inequality, in the order of imp_ineq
+        e = None
+        for B in self.imp_rows(cf.arity):
+            for row in B[B.dot(costs) > 0].tolist():
+                if e is None or row < e:
+                    e = row
+        if e is None:
+            return True
+        return False,e
     
+    def is_wpol(self,cf):
+        """ Test if this weighted operation is a weighted polymorphism
+        of a cost function, i.e. if it improves the cost function.
+
+        The tableaux are visited starting from the tuples of lowest
+        cost, and we stop at the first violated inequality (see
+        :meth:`improves`).
+
+        :param cf: The cost function we are checking.
+        :type cf: :class:`CostFunction`
+        :rtype: boolean
+        """
+        return self.improves(cf,smallest=False) is True
+
+    def imp_matrix(self,r):
+        """ Return the matrix of :meth:`imp_ineq` in compressed sparse
+        row form.
+
+        :param r: The arity of the cost functions.
+        :type r: integer
+        :returns: A tuple (start,cols,vals), where the non-zero entries
+            of the i-th row are vals[start[i]:start[i+1]] in the columns
+            cols[start[i]:start[i+1]], and there are len(start)-1 rows.
+        :rtype: :py:func:`tuple` of :class:`numpy.ndarray`
+
+        .. note:: The rows are in the same order as imp_ineq. The matrix
+            is computed on the first call for each arity and stored.
+        """
+        if r not in self.imps:
+            blocks = [unique_rows(B) for B in self.imp_rows(r)]
+            if len(blocks) > 0:
+                A = unique_rows(numpy.vstack(blocks))
+            else:
+                A = numpy.zeros((0,self.dom**r),dtype=int)
+            (rows,cols) = numpy.nonzero(A)
+            start = numpy.searchsorted(rows,numpy.arange(len(A)+1))
+            self.imps[r] = (start,cols,A[rows,cols])
+        return self.imps[r]
+
+    def improves_many(self,cost_functions,workers=None,block=1 << 22):
+        """ Test if this weighted operation improves each of a list of
+        cost functions.
+
+        :param cost_functions: The cost functions.
+        :type cost_functions: :py:func:`list` of :class:`CostFunction`
+        :param workers: The number of processes the cost functions are
+            divided between.
+        :type workers: integer, optional
+        :param block: The largest number of products of an entry of the
+            inequality matrix with a cost computed at once.
+        :type block: integer, optional
+        :returns: The answer of :meth:`improves` for each cost function,
+            in the same order.
+        :rtype: :py:func:`list`
+
+        .. note:: The inequalities are computed once for each arity (see
+            :meth:`imp_matrix`). The costs of the cost functions of each
+            arity are the columns of a matrix, which is multiplied by
+            the sparse inequality matrix a block of columns at a time.
+        """
+        if workers is not None and workers > 1 and len(cost_functions) > 1:
+            for r in set(cf.arity for cf in cost_functions):
+                self.imp_matrix(r)
+            n = (len(cost_functions) + workers - 1) // workers
+            shards = [cost_functions[i:i+n]
+                      for i in range(0,len(cost_functions),n)]
+            answers = parallel.pool_map(improves_task,shards,workers,
+                                        {'wop': self})
+            return [a for answer in answers for a in answer]
+
+        result = [True for _ in cost_functions]
+        for r in set(cf.arity for cf in cost_functions):
+            (start,cols,vals) = self.imp_matrix(r)
+            index = [i for i in range(len(cost_functions))
+                     if cost_functions[i].arity == r]
+            if len(vals) == 0:
+                continue
+            k = max(1,block // len(vals))
+            for lo in range(0,len(index),k):
+                C = numpy.column_stack([cost_functions[i].cost_table()
+                                        for i in index[lo:lo+k]])
+                Ax = numpy.add.reduceat(vals[:,None]*C[cols],start[:-1],
+                                        axis=0)
+                V = Ax > 0
+                # The first violated row for each cost function
+                first = V.argmax(axis=0)
+                for j in numpy.flatnonzero(V.any(axis=0)):
+                    e = numpy.zeros(self.dom**r,dtype=vals.dtype)
+                    a = start[first[j]]
+                    b = start[first[j]+1]
+                    e[cols[a:b]] = vals[a:b]
+                    result[index[lo+j]] = (False,e.tolist())
+        return result
+
     def translate(self,F,clone=None):
         """ Return the translation by a list of operations.
         
@@ -261,12 +422,18 @@ class WeightedOperation:
         if clone[0].dom != self.dom:
             raise DomainError(clone[0].dom)
 
+        # If F is contained in the clone, we can look up the
+        # compositions by index
+        try:
+            t = [clone.get_index(g) for g in F]
+        except KeyError:
+            t = None
         row = [0 for _ in range(len(clone))]
         for (f,w) in self.weight_iter():
-            try: 
+            if t is None:
                 row[clone.get_index(f.compose(F))] += w
-            except KeyError:
-                raise KeyError
+            else:
+                row[clone.compose_index(f,t)] += w
         return row
 
     def translations(self,arity,clone=None):
@@ -282,33 +449,96 @@ class WeightedOperation:
 
         .. note:: If no clone is passed as input, we use the smallest
             clone containing all the elements of self.ops.
+
+        .. note:: The rows are built from the value tables of the
+            supporting operations and the clone (see
+            :meth:`Clone.compose_indices`), so no new operations are
+            created.
+
+        .. note:: Only one tuple of terms is used from each orbit under
+            the symmetry group (see :meth:`symmetry_group`).
         """
 
         if clone is None:
             clone = Clone.generate(self.ops,arity)
         N = len(clone)
 
-        # Each tuple of terms in the clone gives rise to a generator
-        A = []
-        for t in it.product(range(N),repeat=self.arity):
-            F = [clone[i] for i in t]
-            row = [0 for _ in range(N)]
-            for (f,w) in self.weight_iter():#zip(self.ops,self.weights):
-                try: 
-                    row[clone.get_index(f.compose(F))] += w
-                except KeyError:
-                    raise KeyError
-
-            # Add non-zero rows if they are are not already in A.
-            # We keep A sorted to make this check more efficient
-            if min(row) != 0:
-                if len(A) == 0:
-                    A = [row]
-                else:
-                    i = binary_search(A,row)
-                    if i == len(A) or A[i] != row:
-                        A.insert(i,row)
-        return A
+        support = list(self.weight_iter())
+        dtype = numpy.array([w for (f,w) in support]).dtype
+
+        # Each tuple of terms in the clone gives rise to a generator.
+        # Tuples in the same orbit under the symmetry group give the
+        # same generator, so only one tuple per orbit is used.
+        # Rows with a zero entry are dropped, and the others are kept
+        # once each, in sorted order.
+        A = InequalityMatrix()
+        for T in self.orbit_tuples(N):
+            B = numpy.zeros((len(T),N),dtype=dtype)
+            for (f,w) in support:
+                R = clone.compose_indices(f,T)
+                if (R < 0).any():
+                    raise KeyError(f)
+                numpy.add.at(B,(numpy.arange(len(T)),R),w)
+            A.extend(B[B.min(axis=1) != 0])
+        A.sort()
+        return A.to_list()
+
+    def symmetry_group(self):
+        """ Return the permutations of the arguments which fix this
+        weighted operation.
+
+        :returns: The permutations s of range(arity) such that each
+            operation f has the same weight as the operation
+            (x_0,...,x_{arity-1}) -> f(x_s[0],...,x_s[arity-1]), starting
+            with the identity.
+        :rtype: :py:func:`list` of :py:func:`tuple`
+
+        .. note:: The group is computed from the value tables of the
+            supporting operations on the first call and stored.
+        """
+        if self.group is None:
+            X = tuple_array(self.arity,self.dom)
+            place = radix(self.arity,self.dom)
+            weight = dict((f.value_table().tostring(),w)
+                          for (f,w) in self.weight_iter())
+            self.group = []
+            for s in it.permutations(range(self.arity)):
+                c = X[:,list(s)].astype(numpy.int64).dot(place)
+                if all(weight.get(f.value_table()[c].tostring()) == w
+                       for (f,w) in self.weight_iter()):
+                    self.group.append(s)
+        return self.group
+
+    def orbit_tuples(self,n,block=1 << 12):
+        """ Generate one tuple from each orbit of the arity-tuples over
+        range(n) under the symmetry group.
+
+        :param n: The number of elements.
+        :type n: integer
+        :param block: The number of tuples considered at a time.
+        :type block: integer, Optional
+        :returns: An iterator over arrays, whose rows are the tuples which
+            are lexicographically smallest in their orbit, in
+            lexicographic order.
+        :rtype: iterator of :class:`numpy.ndarray`
+
+        .. note:: If every permutation fixes this weighted operation,
+            the tuples are the non-decreasing ones, which are enumerated
+            directly.
+        """
+        G = self.symmetry_group()
+        if len(G) == math.factorial(self.arity):
+            for T in tableau.combinations(n,self.arity,block):
+                yield T
+            return
+        place = n**numpy.arange(self.arity-1,-1,-1,dtype=numpy.int64)
+        for T in index_tuples([(0,n)]*self.arity,block=block):
+            code = T.dot(place)
+            keep = numpy.ones(len(T),dtype=bool)
+            for s in G[1:]:
+                keep &= code <= T[:,list(s)].dot(place)
+            if keep.any():
+                yield T[keep]
     
     def in_wclone(self,other,clone=None):
         """ Test if another weighted operation is in the weighted
@@ -328,6 +558,10 @@ class WeightedOperation:
 
         .. note: If no clone is passed as input, we use the method
             Clone.generate to obtain the clone.
+
+        .. note:: A single linear program (see :class:`MembershipLP`)
+            gives either the certificate or, from its dual values, the
+            separating cost function.
         """
         
         if clone is None:
@@ -339,54 +573,234 @@ class WeightedOperation:
             if not f in clone:
                 return False
             
-        N = len(clone)
         A = self.translations(other.arity,clone)
+        lp = MembershipLP(A,len(clone))
+        return self.membership_certificate(clone,A,
+                                           lp.solve(other.weight_row(clone)))
+
+    def in_wclone_colgen(self,other,clone=None,columns=64,block=1 << 18):
+        """ Test if another weighted operation is in the weighted clone
+        generated by this weighted operation, generating translations
+        as they are needed.
+
+        The membership program (see :class:`MembershipLP`) starts with
+        no translations. After each solve, the translations with the
+        largest inner product with the dual values (the most negative
+        reduced costs) are added, until none of them has a positive
+        inner product. At that point the answer is the same as for the
+        program with every translation.
 
-        prob = pulp.LpProblem()
+        :param other: The other weighted operation.
+        :type other: :class:`WeightedOperation`
+        :param clone: The supporting clone, as in :meth:`in_wclone`.
+        :type clone: :class:`Clone`, Optional
+        :param columns: The largest number of translations added after
+            each solve.
+        :type columns: integer, Optional
+        :param block: The number of tuples of operations priced before
+            checking if enough translations have been found.
+        :type block: integer, Optional
+        :returns: The same answer as :meth:`in_wclone`, where the
+            certificate only uses the generated translations.
+        :rtype: (boolean,:py:func:`list`)
 
-        # A variable for each non-redundant translation
-        y = pulp.LpVariable.dicts("y",range(len(A)),0)
+        .. note:: The translations are never all stored, so this can
+            be used with clones for which :meth:`translations` is too
+            large. Pricing stops as soon as enough translations are
+            found, but proving the final answer composes the supporting
+            operations with every tuple of operations in the clone.
+        """
+        if clone is None:
+            # Use the clone generated by the operations in self.ops
+            clone = Clone.generate(self.ops,other.arity)
 
-        # No objective function
-        prob += 0
+        # All operations in other must be contained in the clone
+        for f in other.ops:
+            if not f in clone:
+                return False
 
-        for j in range(N):
-            #k = other.ops.index(clone[j])
-            prob += (sum([A[i][j]*y[i] for i in range(len(A))])
-                     == other.get_weight(clone[j]))            
+        A = InequalityMatrix()
+        lp = MembershipLP([],len(clone))
+        b = other.weight_row(clone)
+
+        # The tuples of operations are priced a block at a time, and
+        # the blocks are visited cyclically. The answer is only final
+        # once a whole cycle has been priced without a new translation.
+        total = len(clone)**self.arity
+        nblocks = (total + block - 1) // block
+        i = 0
+        while True:
+            answer = lp.solve(b)
+            if answer[0]:
+                break
+            new = []
+            scanned = 0
+            while scanned < nblocks and len(new) < columns:
+                for row in self.price_translations(clone,answer[1],columns,
+                                                   i*block,(i+1)*block):
+                    if A.add(row):
+                        new.append(row)
+                i = (i+1) % nblocks
+                scanned += 1
+            if len(new) == 0:
+                break
+            lp.add_rows(new)
+        return self.membership_certificate(clone,A.to_list(),answer)
+
+    def price_translations(self,clone,z,k,lo=0,hi=None):
+        """ Return the translations with the largest positive inner
+        products with a vector.
+
+        :param clone: The supporting clone.
+        :type clone: :class:`Clone`
+        :param z: A value for each operation in the clone.
+        :type z: sequence of rational
+        :param k: The largest number of translations to return.
+        :type k: integer
+        :param lo: The position of the first tuple of operations to
+            translate by, in lexicographic order.
+        :type lo: integer, Optional
+        :param hi: The position after the last one.
+        :type hi: integer, Optional
+        :returns: At most k translations t with t.z > 0, as rows indexed
+            by the clone, in decreasing order of t.z.
+        :rtype: :py:func:`list` of :py:func:`list`
+        :raises: KeyError, if a composition is not in the clone
+        """
+        N = len(clone)
+        if hi is None:
+            hi = N**self.arity
+        hi = min(hi,N**self.arity)
+        z = numpy.asarray(z,dtype=float)
+        support = list(self.weight_iter())
+        # The composition of the i-th projection with t is t[i]
+        X = tuple_array(self.arity,self.dom)
+        proj = dict()
+        for (f,w) in support:
+            for i in range(self.arity):
+                if numpy.array_equal(f.value_table(),X[:,i]):
+                    proj[f] = i
+        best = numpy.zeros((0,self.arity),dtype=numpy.intp)
+        value = numpy.zeros(0)
+        for start in range(lo,hi,1 << 14):
+            # Decode the tuples of operations
+            code = numpy.arange(start,min(start+(1 << 14),hi))
+            T = numpy.empty((len(code),self.arity),dtype=numpy.intp)
+            for j in range(self.arity-1,-1,-1):
+                (code,T[:,j]) = divmod(code,N)
+            v = numpy.zeros(len(T))
+            for (f,w) in support:
+                if f in proj:
+                    R = T[:,proj[f]]
+                else:
+                    R = clone.compose_indices(f,T)
+                if (R < 0).any():
+                    raise KeyError(f)
+                v += w*z[R]
+            keep = v > MembershipLP.tol
+            best = numpy.vstack([best,T[keep]])
+            value = numpy.concatenate([value,v[keep]])
+            if len(value) > k:
+                top = numpy.argsort(-value,kind='mergesort')[:k]
+                (best,value) = (best[top],value[top])
+        order = numpy.argsort(-value,kind='mergesort')
+        rows = []
+        for t in best[order]:
+            row = [0 for _ in range(N)]
+            for (f,w) in support:
+                row[clone.compose_index(f,t)] += w
+            rows.append(row)
+        return rows
+
+    def in_wclone_many(self,others,clone=None,workers=None):
+        """ Test if each of a list of weighted operations is in the
+        weighted clone generated by this weighted operation.
+
+        :param others: The other weighted operations, all of the same
+            arity.
+        :type others: :py:func:`list` of :class:`WeightedOperation`
+        :param clone: The supporting clone, as in :meth:`in_wclone`.
+        :type clone: :class:`Clone`, Optional
+        :param workers: The number of processes used to answer the
+            questions.
+        :type workers: integer, optional
+        :returns: The answer of :meth:`in_wclone` for each weighted
+            operation, in the same order.
+        :rtype: :py:func:`list`
+
+        .. note:: The translations are computed once and the same
+            :class:`MembershipLP` is used for every weighted operation,
+            so only its right hand side changes between solves.
+        """
+        if len(others) == 0:
+            return []
+        if clone is None:
+            # Use the clone generated by the operations in self.ops
+            clone = Clone.generate(self.ops,others[0].arity)
 
-        prob.solve()
+        A = self.translations(others[0].arity,clone)
+        lp = MembershipLP(A,len(clone))
 
-        if pulp.LpStatus[prob.status] == 'Optimal':
+        # All operations in other must be contained in the clone
+        inside = [i for i in range(len(others))
+                  if all(f in clone for f in others[i].ops)]
+        B = [others[i].weight_row(clone) for i in inside]
+        answers = parallel.pool_map(membership_task,B,workers,{'lp': lp})
+
+        result = [False for _ in others]
+        for (i,answer) in zip(inside,answers):
+            result[i] = self.membership_certificate(clone,A,answer)
+        return result
+
+    def weight_row(self,clone):
+        """ Return the weights of this weighted operation as a row
+        indexed by a clone.
+
+        :param clone: A clone containing the supporting operations.
+        :type clone: :class:`Clone`
+        :returns: A row storing the weight assigned to the i-th operation
+            in the clone at the i-th location.
+        :rtype: :py:func:`list`
+        """
+        row = [0 for _ in range(len(clone))]
+        for (f,w) in self.weight_iter():
+            row[clone.get_index(f)] += w
+        return row
+
+    def membership_certificate(self,clone,A,answer):
+        """ Return the certificate of an answer to a membership problem
+        for the weighted clone.
+
+        :param clone: The supporting clone.
+        :type clone: :class:`Clone`
+        :param A: The translations.
+        :type A: :py:func:`list` of :py:func:`list`
+        :param answer: The answer given by :meth:`MembershipLP.solve`.
+        :returns: (True,cert), where cert is a list of pairs of weights
+            and translations, or (False,cf), where cf is a separating
+            cost function.
+
+        .. note:: Every translation and every weighted operation has
+            total weight 0, so adding a constant to the Farkas
+            certificate gives another one. We shift it so that the
+            smallest cost is 0.
+        """
+        (ans,v) = answer
+        N = len(clone)
+        if ans:
             cert = []
             for i in range(len(A)):
-                val = round(pulp.value(y[i]),self.dom)
+                val = round(v[i],self.dom)
                 if val != 0:
                     cert.append((val,
                                  [(A[i][j],str(clone[j])) for j in range(N)
                                   if A[i][j] != 0]))
             return (True,cert)
-        # If no solution, then solve the dual
-        # Need to figure out better method than this. Should be able
-        # to use values of primal variables on termination.
         else:
-            prob = pulp.LpProblem()
-
-            # A variable for each non-redundant translation
-            z = pulp.LpVariable.dicts("z",range(N),0)
-
-            # No objective function
-            prob += 0
-
-            for i in range(len(A)):
-                prob += (pulp.lpSum([A[i][j]*z[j] for j in range(N)]) <= 0, "")
-            prob += pulp.lpSum([w*z[clone.get_index(f)]
-                           for (f,w) in other.weight_iter()]) >= 1,""
-            prob.solve()
+            least = min(v)
             costs = dict()
             for i in range(N):
-                costs[clone[i].value_tuple()] = round(pulp.value(z[i]),
-                                                      self.dom)                
+                costs[clone[i].value_tuple()] = round(v[i]-least,self.dom)
             return (False,CostFunction(len(costs.keys()[0]),self.dom,costs))
 
     def wclone(self,k,clone=None,log=False):
@@ -468,3 +882,27 @@ class WeightedOperation:
                     weights.append(rval)
             wclone.append(WeightedOperation(k,self.dom,ops,weights))
         return wclone
+
+# Global functions
+def unique_rows(B):
+    """ Return the distinct rows of a matrix, in lexicographic order.
+
+    Rows of objects, e.g. of :class:`fractions.Fraction`, are sorted as
+    tuples, since :func:`numpy.unique` only compares them along an axis
+    for numbers.
+    """
+    if B.dtype != object:
+        return numpy.unique(B,axis=0)
+    rows = sorted(set(tuple(row) for row in B.tolist()))
+    return numpy.array(rows,dtype=object).reshape(len(rows),B.shape[1])
+
+def improves_task(cost_functions):
+    """ Test the cost functions with the weighted operation shared with
+    a worker process (see :meth:`WeightedOperation.improves_many`). """
+    return parallel.shared['wop'].improves_many(cost_functions)
+
+def membership_task(b):
+    """ Solve the membership program shared with a worker process for
+    one right hand side (see :meth:`WeightedOperation.in_wclone_many`).
+    """
+    return parallel.shared['lp'].solve(b)